@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the redaction and logging path
+
+Usage: ./benchmark.py [repeat]
+
+Reports lines/sec and peak traced allocations of filter_datum,
+RedactingFormatter.format and the end-to-end exporters, the latter
+fed by an in-memory fake cursor instead of MySQL.
+"""
+import contextlib
+import logging
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+import filtered_logger
+from filtered_logger import (
+    PII_FIELDS, RedactingFormatter, export_users, filter_datum, main)
+
+
+class NullStream:
+    """ Text stream discarding everything written to it """
+
+    def write(self, text: str) -> int:
+        """ Discards text """
+        return len(text)
+
+    def flush(self) -> None:
+        """ Nothing to flush """
+
+
+class FakeCursor:
+    """ In-memory stand-in of a MySQL cursor over the users table """
+
+    def __init__(self, fields: List[str], rows: List[tuple]):
+        self.description = [(f,) for f in fields]
+        self.rows = rows
+        self.index = 0
+
+    def execute(self, query: str, params: tuple = None) -> None:
+        """ Rewinds the cursor """
+        self.index = 0
+
+    def fetchmany(self, size: int) -> List[tuple]:
+        """ Returns the next rows """
+        rows = self.rows[self.index:self.index + size]
+        self.index += size
+        return rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self) -> None:
+        """ Nothing to close """
+
+
+class FakeConnection:
+    """ In-memory stand-in of a MySQL connection """
+
+    def __init__(self, fields: List[str], rows: List[tuple]):
+        self.fields = fields
+        self.rows = rows
+
+    def cursor(self, **kwargs) -> FakeCursor:
+        """ Returns a cursor over the rows """
+        return FakeCursor(self.fields, self.rows)
+
+    def close(self) -> None:
+        """ Nothing to close """
+
+
+USER_FIELDS = ['name', 'email', 'phone', 'ssn', 'password',
+               'ip', 'last_login', 'user_agent']
+
+
+def make_message(n_fields: int, hit_ratio: float, separator: str) -> str:
+    """ Builds a log line with n_fields fields, hit_ratio of them PII """
+    hits = round(n_fields * hit_ratio)
+    parts = []
+    for i in range(n_fields):
+        key = PII_FIELDS[i % len(PII_FIELDS)] if i < hits else f'col{i}'
+        parts.append(f'{key}=value{i}-{"x" * 16}{separator}')
+    return ''.join(parts)
+
+
+def make_rows(count: int) -> List[tuple]:
+    """ Builds fake rows of the users table """
+    return [(f'user{i}', f'user{i}@example.com', '555-0100', '123-45-6789',
+             'hunter2', '10.0.0.1', '2019-11-14 06:16:24', 'Mozilla/5.0')
+            for i in range(count)]
+
+
+def measure(name: str, func: Callable, lines: int, repeat: int) -> None:
+    """ Runs func repeat times and prints throughput and allocations """
+    func()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:<48} {lines / best:>14,.0f} lines/s '
+          f'{peak / 1024:>10,.1f} KiB')
+
+
+def bench_filter_datum(repeat: int) -> None:
+    """ filter_datum across sizes, field counts, separators and hits """
+    n = 10000
+    for n_fields in (5, 20, 100):
+        for hit_ratio in (0.0, 0.5, 1.0):
+            for separator in (';', '|', '; '):
+                message = make_message(n_fields, hit_ratio, separator)
+                sep = separator.strip()
+                for fields in (PII_FIELDS[:1], PII_FIELDS):
+                    measure(
+                        f'filter_datum f={n_fields} hit={hit_ratio} '
+                        f'sep={separator!r} redact={len(fields)}',
+                        lambda: [filter_datum(fields, '***', message, sep)
+                                 for _ in range(n)],
+                        n, repeat)
+
+
+def bench_formatter(repeat: int) -> None:
+    """ RedactingFormatter.format over a user row """
+    n = 10000
+    formatter = RedactingFormatter(PII_FIELDS)
+    record = logging.LogRecord('user_data', logging.INFO, __file__, 0,
+                               make_message(8, 0.6, '; '), None, None)
+    measure('RedactingFormatter.format', lambda: [
+        formatter.format(record) for _ in range(n)], n, repeat)
+
+
+def bench_export(repeat: int) -> None:
+    """ End-to-end export of a fake users table """
+    n = 20000
+    rows = make_rows(n)
+    filtered_logger.get_db = lambda: FakeConnection(USER_FIELDS, rows)
+    log = logging.getLogger('user_data')
+
+    def run_main():
+        log.handlers.clear()
+        with contextlib.redirect_stderr(NullStream()):
+            main()
+
+    measure('main() per-row logging', run_main, n, repeat)
+    measure('export_users() batched stream',
+            lambda: export_users(stream=NullStream()), n, repeat)
+    log.handlers.clear()
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    bench_filter_datum(repeat)
+    bench_formatter(repeat)
+    bench_export(repeat)
@@ -2,9 +2,98 @@
 """
 encrypt password module
 """
+import asyncio
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from os import getenv
+from typing import Iterable, List, Optional, Tuple
+import time
 import bcrypt
 
 
+DEFAULT_ROUNDS: int = 12
+MIN_ROUNDS: int = 4
+MAX_ROUNDS: int = 31
+# Lowest cost factor calibration may pick, however small the budget
+MIN_SAFE_ROUNDS: int = 10
+_rounds: Optional[int] = None
+
+
+def calibrate_rounds(target_ms: float, probe_rounds: int = 8) -> int:
+    """
+    Benchmarks bcrypt on this host and picks the cost factor
+    whose hashing time stays within a latency budget.
+
+    Args:
+        target_ms: latency budget of one hash in milliseconds.
+        probe_rounds: cost factor timed to extrapolate the others.
+
+    Returns:
+        the highest rounds value expected to hash within target_ms,
+        never less than MIN_SAFE_ROUNDS.
+    """
+    salt = bcrypt.gensalt(rounds=probe_rounds)
+    elapsed = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', salt)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    # Each extra round doubles the work.
+    rounds = probe_rounds
+    while rounds < MAX_ROUNDS and \
+            elapsed * 2 ** (rounds + 1 - probe_rounds) * 1000 <= target_ms:
+        rounds += 1
+    while rounds > MIN_ROUNDS and \
+            elapsed * 2 ** (rounds - probe_rounds) * 1000 > target_ms:
+        rounds -= 1
+    return max(rounds, MIN_SAFE_ROUNDS)
+
+
+def get_rounds() -> int:
+    """
+    Resolves once the cost factor used for new hashes: BCRYPT_ROUNDS
+    if set, else calibrated against BCRYPT_TARGET_MS if set,
+    else the bcrypt default.
+
+    Returns:
+        bcrypt rounds.
+    """
+    global _rounds
+    if _rounds is None:
+        if getenv('BCRYPT_ROUNDS'):
+            _rounds = int(getenv('BCRYPT_ROUNDS'))
+        elif getenv('BCRYPT_TARGET_MS'):
+            _rounds = calibrate_rounds(float(getenv('BCRYPT_TARGET_MS')))
+        else:
+            _rounds = DEFAULT_ROUNDS
+    return _rounds
+
+
+def _use_rounds(rounds: int) -> None:
+    """
+    Sets the cost factor used for new hashes, so pool workers use the
+    one resolved by their parent instead of calibrating their own.
+
+    Args:
+        rounds: bcrypt rounds.
+    """
+    global _rounds
+    _rounds = rounds
+
+
+def hash_rounds(hashed_password: bytes) -> int:
+    """
+    Reads the cost factor stored in a bcrypt hash.
+
+    Args:
+        hashed_password: hashed password, as `$2b$<rounds>$<salt+hash>`.
+
+    Returns:
+        bcrypt rounds.
+    """
+    return int(hashed_password.split(b'$')[2])
+
+
 def hash_password(password: str) -> bytes:
     """
     Hashes a password using bcrypt.
@@ -16,7 +105,8 @@ def hash_password(password: str) -> bytes:
         salted and hashed password.
     """
     pass_encoded = password.encode()
-    pass_hashed = bcrypt.hashpw(pass_encoded, bcrypt.gensalt())
+    pass_hashed = bcrypt.hashpw(
+      pass_encoded, bcrypt.gensalt(rounds=get_rounds()))
     return pass_hashed
 
 
@@ -33,3 +123,149 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     """
     pass_encoded = password.encode()
     return bcrypt.checkpw(pass_encoded, hashed_password)
+
+
+def verify_and_upgrade(
+  hashed_password: bytes, password: str) -> Tuple[bool, Optional[bytes]]:
+    """
+    Validates a password and rehashes it when its stored cost factor
+    differs from the current one.
+
+    Args:
+        hashed_password: hashed password.
+        password: password to be validated.
+
+    Returns:
+        whether the password is valid, and the new hash to store
+        or None if the stored one is still current.
+    """
+    if not is_valid(hashed_password, password):
+        return False, None
+    if hash_rounds(hashed_password) == get_rounds():
+        return True, None
+    return True, hash_password(password)
+
+
+class HashingService:
+    """
+    Runs bcrypt hashing and verification on a thread or process pool
+    so callers can batch them or overlap them with I/O.
+    bcrypt releases the GIL, so threads already hash in parallel.
+    The cost factor is resolved once at startup and handed to process
+    workers, so every worker hashes with the same one.
+    """
+
+    KINDS = ('thread', 'process')
+
+    def __init__(self, kind: str = 'thread', workers: int = None):
+        """
+        Resolves the cost factor and starts the pool.
+
+        Args:
+            kind: `thread` or `process`.
+            workers: Pool size, the executor default if None.
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown pool kind: {kind}")
+        rounds = get_rounds()
+        if kind == 'thread':
+            self._executor = ThreadPoolExecutor(workers)
+        else:
+            self._executor = ProcessPoolExecutor(
+              workers, initializer=_use_rounds, initargs=(rounds,))
+
+    def submit_hash(self, password: str) -> Future:
+        """
+        Schedules the hashing of a password.
+
+        Args:
+            password: password to be hashed.
+
+        Returns:
+            A future of the salted and hashed password.
+        """
+        return self._executor.submit(hash_password, password)
+
+    def submit_verify(self, hashed_password: bytes, password: str) -> Future:
+        """
+        Schedules the validation of a password.
+
+        Args:
+            hashed_password: hashed password.
+            password: password to be validated.
+
+        Returns:
+            A future of the validation result.
+        """
+        return self._executor.submit(is_valid, hashed_password, password)
+
+    def hash_many(self, passwords: Iterable[str]) -> List[bytes]:
+        """
+        Hashes passwords in parallel.
+
+        Args:
+            passwords: passwords to be hashed.
+
+        Returns:
+            salted and hashed passwords, in input order.
+        """
+        return list(self._executor.map(hash_password, passwords))
+
+    def verify_many(
+      self, pairs: Iterable[Tuple[bytes, str]]) -> List[bool]:
+        """
+        Validates passwords in parallel.
+
+        Args:
+            pairs: (hashed password, password) tuples.
+
+        Returns:
+            validation results, in input order.
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return []
+        hashed, passwords = zip(*pairs)
+        return list(self._executor.map(is_valid, hashed, passwords))
+
+    async def hash_async(self, password: str) -> bytes:
+        """
+        Hashes a password without blocking the event loop.
+
+        Args:
+            password: password to be hashed.
+
+        Returns:
+            salted and hashed password.
+        """
+        return await asyncio.wrap_future(self.submit_hash(password))
+
+    async def verify_async(
+      self, hashed_password: bytes, password: str) -> bool:
+        """
+        Validates a password without blocking the event loop.
+
+        Args:
+            hashed_password: hashed password.
+            password: password to be validated.
+
+        Returns:
+            bool
+        """
+        return await asyncio.wrap_future(
+          self.submit_verify(hashed_password, password))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stops the pool.
+
+        Args:
+            wait: Whether to wait for pending jobs.
+        """
+        self._executor.shutdown(wait)
+
+    def __enter__(self) -> 'HashingService':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
@@ -1,13 +1,117 @@
 #!/usr/bin/env python3
 """ Regexing Module """
 import re
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import (
+  Callable, FrozenSet, Iterator, List, TextIO, Tuple, Union)
+import copy
+import io
+import json
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener
 import mysql.connector
+import os
 from os import getenv
+import queue
+import sys
+import threading
 
 
 PII_FIELDS: List[str] = ['name', 'email', 'phone', 'ssn', 'password']
+EXPORT_BATCH_SIZE: int = 1000
+POOL_SIZE: int = 5
+LOG_QUEUE_SIZE: int = 10000
+
+
+class Redactor:
+    """
+    Precompiled redaction engine that obfuscates several fields
+    of a log line in a single regex pass.
+    """
+
+    def __init__(
+      self, fields: FrozenSet[str], redaction: str, separator: str):
+        self.fields = fields
+        self.redaction = redaction
+        self.separator = separator
+        if not fields:
+            self.pattern = self.bytes_pattern = None
+            return
+        names = '|'.join(re.escape(f) for f in sorted(fields))
+        sep = re.escape(separator)
+        self.pattern = re.compile(rf"(?P<field>{names})=.*?{sep}")
+        # Each field maps to its prebuilt replacement, looked up by a
+        # callable: cheaper than expanding a `\g<field>` template on
+        # every match, and it also works on memoryview and mmap buffers.
+        self.replacements = {
+          f: f"{f}={redaction}{separator}" for f in fields}
+        self.bytes_pattern = re.compile(self.pattern.pattern.encode())
+        self.bytes_replacements = {
+          f.encode(): r.encode() for f, r in self.replacements.items()}
+
+    def redact(self, message: str) -> str:
+        """
+        Obfuscates every configured field of a log message.
+
+        Args:
+            message: A string representing the log line.
+
+        Returns:
+            The obfuscated log message.
+        """
+        if self.pattern is None:
+            return message
+        return self.pattern.sub(self._replacement, message)
+
+    def _replacement(self, match: re.Match) -> str:
+        """
+        Returns the redacted form of a matched field.
+        """
+        return self.replacements[match[1]]
+
+    def _bytes_replacement(self, match: re.Match) -> bytes:
+        """
+        Returns the redacted form of a matched bytes field.
+        """
+        return self.bytes_replacements[match[1]]
+
+    def redact_bytes(self, data: Union[bytes, memoryview]) -> bytes:
+        """
+        Obfuscates every configured field of UTF-8 encoded log lines
+        without decoding them.
+
+        Args:
+            data: A bytes-like object such as bytes, memoryview or mmap.
+
+        Returns:
+            The obfuscated log lines.
+        """
+        if self.bytes_pattern is None:
+            return bytes(data)
+        return self.bytes_pattern.sub(self._bytes_replacement, data)
+
+
+@lru_cache(maxsize=64)
+def get_redactor(
+  fields: FrozenSet[str], redaction: str, separator: str) -> Redactor:
+    """
+    Retrieves the compiled redaction engine for a field set.
+
+    Args:
+        fields: A frozenset of fields to obfuscate.
+        redaction: A string for value to replace fields with.
+        separator: A string for character separating fields in log line.
+
+    Returns:
+        A cached Redactor instance.
+    """
+    return Redactor(fields, redaction, separator)
+
+
+_redactors: dict = {}
 
 
 def filter_datum(
@@ -25,11 +129,35 @@ def filter_datum(
     Returns:
         The obfuscated log message.
     """
-    for field in fields:
-        message = re.sub(
-          rf"{field}=.*?{separator}",
-          rf"{field}={redaction}{separator}", message)
-    return message
+    # Keyed by the fields as given: cheaper to build and hash than the
+    # frozenset key of get_redactor, which only runs on a miss.
+    key = (tuple(fields), redaction, separator)
+    redactor = _redactors.get(key)
+    if redactor is None:
+        redactor = get_redactor(frozenset(fields), redaction, separator)
+        if len(_redactors) < 256:
+            _redactors[key] = redactor
+    return redactor.redact(message)
+
+
+def filter_datum_bytes(
+  fields: List[str],
+  redaction: str, message: Union[bytes, memoryview], separator: str) -> bytes:
+    """
+    Obfuscates specified fields in UTF-8 encoded log lines,
+    with the same semantics as filter_datum.
+
+    Args:
+        fields: A list of strings for fields to obfuscate.
+        redaction: A string for value to replace fields with.
+        message: A bytes-like object holding the log lines.
+        separator: A string for character separating fields in log line.
+
+    Returns:
+        The obfuscated log lines.
+    """
+    return get_redactor(
+      frozenset(fields), redaction, separator).redact_bytes(message)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -45,6 +173,8 @@ class RedactingFormatter(logging.Formatter):
     def __init__(self, fields: List[str]):
         super().__init__(self.FORMAT)
         self.fields = fields
+        self.redactor = get_redactor(
+          frozenset(fields), self.REDACTION, self.SEPARATOR)
 
     def format(self, record: logging.LogRecord) -> str:
         """
@@ -56,15 +186,229 @@ class RedactingFormatter(logging.Formatter):
         Returns:
             The formatted log message with redacted sensitive information.
         """
-        return filter_datum(
-          self.fields,
-          self.REDACTION,
-          super().format(record), self.SEPARATOR)
+        return self.redactor.redact(super().format(record))
+
+    def format_batch(
+      self, record: logging.LogRecord, messages: List[str]) -> str:
+        """
+        Formats several messages sharing the metadata of one record
+        and redacts them all in a single pass.
 
+        Args:
+            record: The log record providing name, level and time.
+            messages: The log lines to format.
 
-def get_logger() -> logging.Logger:
+        Returns:
+            The newline terminated, redacted block of log lines.
+        """
+        record.msg, record.args = '', None
+        prefix = super().format(record)
+        return self.redactor.redact(
+          ''.join(f'{prefix}{message}\n' for message in messages))
+
+
+class StructuredFormatter(RedactingFormatter):
     """
-    Retrieves a logger with redaction of sensitive information.
+    Formatter for records whose message is a dict of fields: values of
+    sensitive keys are dropped by key lookup instead of regex, and the
+    line is emitted in the `key=value;` layout or as JSON.
+    Records with a plain string message are redacted as usual.
+    """
+
+    LAYOUTS = ('kv', 'json')
+
+    def __init__(self, fields: List[str], layout: str = 'kv'):
+        if layout not in self.LAYOUTS:
+            raise ValueError(f"unknown layout: {layout}")
+        super().__init__(fields)
+        self.layout = layout
+        self.field_set = frozenset(fields)
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Formats the log record and redacts sensitive information.
+
+        Args:
+            record: The log record to format.
+
+        Returns:
+            The formatted log message with redacted sensitive information.
+        """
+        if not isinstance(record.msg, dict):
+            return super().format(record)
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        record.asctime = self.formatTime(record, self.datefmt)
+        if self.layout == 'json':
+            line = json.dumps({
+              'name': record.name,
+              'levelname': record.levelname,
+              'asctime': record.asctime,
+              'fields': self.redact_fields(record.msg),
+              **({'exc_text': record.exc_text} if record.exc_text else {})
+            }, default=str)
+        else:
+            record.message = ' '.join(
+              f'{key}={self.REDACTION}{self.SEPARATOR}'
+              if key in self.field_set else
+              f'{key}={value}{self.SEPARATOR}'
+              for key, value in record.msg.items())
+            line = self.formatMessage(record)
+            if record.exc_text:
+                line = f'{line}\n{record.exc_text}'
+        return line
+
+    def redact_fields(self, fields: dict) -> dict:
+        """
+        Replaces the values of sensitive keys.
+
+        Args:
+            fields: A dict of log fields.
+
+        Returns:
+            A new dict with sensitive values redacted.
+        """
+        return {
+          key: self.REDACTION if key in self.field_set else value
+          for key, value in fields.items()}
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Queue handler applying a backpressure policy when the queue is full:
+    `block` waits for room, `drop` discards the record and `count`
+    discards it and reports the number of dropped records later on.
+    """
+
+    POLICIES = ('block', 'drop', 'count')
+
+    def __init__(self, log_queue: queue.Queue, policy: str = 'block'):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.dropped = 0
+        self._unreported = 0
+
+    @property
+    def policy(self) -> str:
+        """
+        Backpressure policy, one of POLICIES.
+        """
+        return self._policy
+
+    @policy.setter
+    def policy(self, policy: str) -> None:
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown backpressure policy: {policy}")
+        self._policy = policy
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Makes a record safe to hand over to the listener thread,
+        keeping dict messages intact for StructuredFormatter.
+
+        Args:
+            record: The log record to enqueue.
+
+        Returns:
+            The record to put on the queue.
+        """
+        if not isinstance(record.msg, dict):
+            return super().prepare(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(
+              record.exc_info)
+        record = copy.copy(record)
+        record.msg = dict(record.msg)
+        record.args = None
+        record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Puts a record on the queue according to the policy.
+
+        Args:
+            record: The prepared log record.
+        """
+        if self.policy == 'block':
+            self.queue.put(record)
+            return
+        try:
+            if self._unreported:
+                self.queue.put_nowait(self.dropped_record(record.name))
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.policy == 'count':
+                self._unreported += 1
+
+    def dropped_record(self, name: str) -> logging.LogRecord:
+        """
+        Builds the warning reporting the records dropped since the
+        last report.
+
+        Args:
+            name: Name of the logger the warning is issued on.
+
+        Returns:
+            The warning log record.
+        """
+        return logging.makeLogRecord({
+          'name': name,
+          'levelno': logging.WARNING,
+          'levelname': logging.getLevelName(logging.WARNING),
+          'msg': f"{self._unreported} log records dropped"})
+
+
+class DrainingQueueListener(QueueListener):
+    """
+    Queue listener that waits for room to post its stop sentinel,
+    so stopping it on a full bounded queue still flushes every record.
+    """
+
+    def enqueue_sentinel(self) -> None:
+        """
+        Blocks until the stop sentinel is on the queue.
+        """
+        self.queue.put(self._sentinel)
+
+
+# (queue handler, listener draining its queue) of every async logger
+_listeners: List[Tuple[BoundedQueueHandler, QueueListener]] = []
+
+
+@atexit.register
+def stop_listeners() -> None:
+    """
+    Flushes and stops every background logging listener, then reports
+    the dropped records no later record got to report.
+    """
+    while _listeners:
+        handler, listener = _listeners.pop()
+        listener.stop()
+        if handler._unreported:
+            listener.handle(handler.dropped_record('user_data'))
+            handler._unreported = 0
+
+
+def get_logger(
+  asynchronous: bool = False, policy: str = 'block',
+  queue_size: int = LOG_QUEUE_SIZE, layout: str = None) -> logging.Logger:
+    """
+    Retrieves a logger with redaction of sensitive information. In
+    async mode, later calls reuse the queue handler and listener of the
+    first one.
+
+    Args:
+        asynchronous: Whether redaction and I/O run on a background thread.
+        policy: Backpressure policy of the queue, see BoundedQueueHandler.
+        queue_size: Maximum number of pending records in async mode,
+            only applied when the queue is created.
+        layout: If set, `kv` or `json` output of a StructuredFormatter
+            accepting dict messages.
 
     Returns:
         A Logger object with redaction enabled.
@@ -74,9 +418,29 @@ def get_logger() -> logging.Logger:
     log.propagate = False
 
     sh = logging.StreamHandler()
-    formatter = RedactingFormatter(PII_FIELDS)
+    if layout is None:
+        formatter = RedactingFormatter(PII_FIELDS)
+    else:
+        formatter = StructuredFormatter(PII_FIELDS, layout)
     sh.setFormatter(formatter)
-    log.addHandler(sh)
+
+    if asynchronous:
+        handler = next((h for h in log.handlers
+                        if isinstance(h, BoundedQueueHandler)), None)
+        if handler is None:
+            handler = BoundedQueueHandler(queue.Queue(queue_size), policy)
+            log.addHandler(handler)
+        else:
+            handler.policy = policy
+        listener = next((lst for h, lst in _listeners if h is handler), None)
+        if listener is None:
+            listener = DrainingQueueListener(handler.queue, sh)
+            listener.start()
+            _listeners.append((handler, listener))
+        else:
+            listener.handlers = (sh,)
+    else:
+        log.addHandler(sh)
 
     return log
 
@@ -97,24 +461,382 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     return connection_db
 
 
+class ConnectionPool:
+    """
+    Thread-safe pool reusing database connections between callers.
+    """
+
+    def __init__(
+      self, factory: Callable = None, size: int = None):
+        if size is None:
+            size = int(getenv('PERSONAL_DATA_DB_POOL_SIZE', POOL_SIZE))
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.size = size
+        self._factory = factory if factory is not None else get_db
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @staticmethod
+    def _is_healthy(connection) -> bool:
+        """
+        Checks that a pooled connection is still usable.
+
+        Args:
+            connection: The connection to check.
+
+        Returns:
+            True if the server still answers, False otherwise.
+        """
+        try:
+            return bool(connection.is_connected())
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(connection) -> None:
+        """
+        Closes a connection, ignoring errors of a dead link.
+
+        Args:
+            connection: The connection to close.
+        """
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout: float = None):
+        """
+        Takes a healthy connection from the pool, opening one if needed.
+
+        Args:
+            timeout: Seconds to wait for a free slot, forever if None.
+
+        Returns:
+            A database connection to give back with `release`.
+
+        Raises:
+            TimeoutError: If no slot was freed before the timeout.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("no database connection available")
+        try:
+            while True:
+                try:
+                    connection = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._factory()
+                if self._is_healthy(connection):
+                    return connection
+                self._discard(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    @staticmethod
+    def _reset(connection) -> bool:
+        """
+        Ends the transaction left open by the previous borrower,
+        autocommit being off, so the next one starts from a fresh
+        snapshot without pending results.
+
+        Args:
+            connection: The connection to reset.
+
+        Returns:
+            True if the connection can be reused, False otherwise.
+        """
+        try:
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def release(self, connection) -> None:
+        """
+        Gives a connection back to the pool, rolled back, or closes it
+        if it is dead or can't be rolled back.
+
+        Args:
+            connection: A connection obtained from `acquire`.
+        """
+        try:
+            if self._is_healthy(connection) and self._reset(connection):
+                self._idle.put(connection)
+            else:
+                self._discard(connection)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout: float = None) -> Iterator:
+        """
+        Borrows a connection for the duration of a `with` block.
+
+        Args:
+            timeout: Seconds to wait for a free slot, forever if None.
+
+        Yields:
+            A database connection.
+        """
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self) -> None:
+        """
+        Closes every idle connection of the pool.
+        """
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+_pool: ConnectionPool = None
+_pool_pid: int = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Retrieves the process-wide connection pool, creating it on first use.
+    A forked process, such as an export worker, gets its own pool: the
+    connections inherited from its parent are left to the parent.
+
+    Returns:
+        The shared ConnectionPool.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def row_template(fields: List[str]) -> str:
+    """
+    Builds the format template of a `key=value;` log line.
+
+    Args:
+        fields: A list of column names.
+
+    Returns:
+        A template to fill with `str.format(*row)`.
+    """
+    return ' '.join(
+      '{}={{}};'.format(f.replace('{', '{{').replace('}', '}}'))
+      for f in fields)
+
+
+def write_redacted_rows(cursor, stream: TextIO, batch_size: int) -> int:
+    """
+    Writes the rows of an executed cursor redacted, one write per batch.
+
+    Args:
+        cursor: A cursor on which a SELECT has been executed.
+        stream: Where to write the log lines.
+        batch_size: Number of rows fetched and written at once.
+
+    Returns:
+        The number of written rows.
+    """
+    template = row_template([i[0] for i in cursor.description])
+    formatter = RedactingFormatter(PII_FIELDS)
+
+    count = 0
+    rows = cursor.fetchmany(batch_size)
+    while rows:
+        record = logging.LogRecord(
+          'user_data', logging.INFO, __file__, 0, '', None, None)
+        stream.write(formatter.format_batch(
+          record, [template.format(*row) for row in rows]))
+        stream.flush()
+        count += len(rows)
+        rows = cursor.fetchmany(batch_size)
+    return count
+
+
+def export_users(
+  batch_size: int = None, stream: TextIO = None) -> int:
+    """
+    Streams the users table through an unbuffered cursor
+    and writes it redacted, one write per batch of rows.
+
+    Args:
+        batch_size: Number of rows fetched and written at once.
+        stream: Where to write the log lines, stderr by default.
+
+    Returns:
+        The number of exported rows.
+    """
+    if batch_size is None:
+        batch_size = int(getenv(
+          'PERSONAL_DATA_EXPORT_BATCH_SIZE', EXPORT_BATCH_SIZE))
+    if stream is None:
+        stream = sys.stderr
+
+    with get_pool().connection() as database:
+        cursor = database.cursor(buffered=False)
+        try:
+            cursor.execute("SELECT * FROM users;")
+            count = write_redacted_rows(cursor, stream, batch_size)
+        finally:
+            cursor.close()
+    return count
+
+
+def export_partition(
+  partition: Tuple[int, int, str, str, int]) -> Tuple[int, str]:
+    """
+    Exports the users whose key hashes to one partition, on a
+    connection of the worker's pool.
+
+    Args:
+        partition: An (index, partitions, key, output_dir, batch_size)
+            tuple: rows with MOD(CRC32(key), partitions) == index are
+            exported.
+
+    Returns:
+        The number of exported rows and either the redacted lines
+        or, when output_dir is set, the path of the written file.
+    """
+    index, partitions, key, output_dir, batch_size = partition
+    with get_pool().connection() as database:
+        cursor = database.cursor(buffered=False)
+        try:
+            cursor.execute(
+              f"SELECT * FROM users WHERE "
+              f"MOD(CRC32(COALESCE({key}, '')), %s) = %s;",
+              (partitions, index))
+            if output_dir is None:
+                with io.StringIO() as stream:
+                    count = write_redacted_rows(cursor, stream, batch_size)
+                    result = stream.getvalue()
+            else:
+                result = os.path.join(output_dir, f'users_{index:04d}.log')
+                with open(result, 'w') as stream:
+                    count = write_redacted_rows(cursor, stream, batch_size)
+        finally:
+            cursor.close()
+    return count, result
+
+
+def export_users_parallel(
+  workers: int = None, partitions: int = None, key: str = None,
+  output_dir: str = None, batch_size: int = None,
+  stream: TextIO = None) -> int:
+    """
+    Exports the users table redacted from a pool of processes.
+    The table has no integer primary key, so rows are split by the
+    CRC32 hash of a column instead of by key ranges. A hash partition
+    can't use an index: each one scans the whole table, so there is
+    one partition per worker by default. More partitions only help
+    balance uneven workers, at the cost of one more scan each.
+
+    Args:
+        workers: Number of processes, the CPU count by default.
+        partitions: Number of hash partitions, `workers` by default.
+        key: The column hashed to partition rows, `email` by default.
+        output_dir: If set, each partition is written to its own file
+            there instead of being merged in partition order into stream.
+        batch_size: Number of rows fetched and written at once.
+        stream: Where to write the merged lines, stderr by default.
+
+    Returns:
+        The number of exported rows.
+    """
+    if workers is None:
+        workers = int(getenv(
+          'PERSONAL_DATA_EXPORT_WORKERS', os.cpu_count() or 1))
+    if partitions is None:
+        partitions = workers
+    if key is None:
+        key = getenv('PERSONAL_DATA_EXPORT_KEY', 'email')
+    if not re.fullmatch(r'\w+', key):
+        raise ValueError(f"invalid key column: {key}")
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    if batch_size is None:
+        batch_size = int(getenv(
+          'PERSONAL_DATA_EXPORT_BATCH_SIZE', EXPORT_BATCH_SIZE))
+    if stream is None:
+        stream = sys.stderr
+
+    shards = [(i, partitions, key, output_dir, batch_size)
+              for i in range(partitions)]
+
+    total = 0
+    with ProcessPoolExecutor(workers) as executor:
+        for count, result in executor.map(export_partition, shards):
+            total += count
+            if output_dir is None:
+                stream.write(result)
+                stream.flush()
+    return total
+
+
+def export_users_structured(layout: str = 'kv') -> int:
+    """
+    Logs every user as a dict of fields through a StructuredFormatter.
+
+    Args:
+        layout: `kv` for the `key=value;` layout or `json` for JSON lines.
+
+    Returns:
+        The number of exported rows.
+    """
+    log = get_logger(layout=layout)
+
+    count = 0
+    with get_pool().connection() as database:
+        cursor = database.cursor(buffered=False)
+        try:
+            cursor.execute("SELECT * FROM users;")
+            fields = [i[0] for i in cursor.description]
+            for row in cursor:
+                log.info(dict(zip(fields, row)))
+                count += 1
+        finally:
+            cursor.close()
+    return count
+
+
 def main():
     """
     Retrieves data from the users table
     and logs it with redaction of sensitive information.
     """
-    database = get_db()
-    cursor = database.cursor()
-    cursor.execute("SELECT * FROM users;")
-    fields = [i[0] for i in cursor.description]
+    mode = getenv('PERSONAL_DATA_EXPORT_MODE')
+    if mode == 'stream':
+        export_users()
+        return
+    if mode == 'parallel':
+        export_users_parallel(
+          output_dir=getenv('PERSONAL_DATA_EXPORT_DIR'))
+        return
+    if mode == 'structured':
+        export_users_structured(getenv('PERSONAL_DATA_LOG_LAYOUT', 'kv'))
+        return
 
     log = get_logger()
 
-    for row in cursor:
-        str_row = ''.join(f'{f}={str(r)}; ' for r, f in zip(row, fields))
-        log.info(str_row.strip())
-
-    cursor.close()
-    database.close()
+    with get_pool().connection() as database:
+        cursor = database.cursor()
+        try:
+            cursor.execute("SELECT * FROM users;")
+            fields = [i[0] for i in cursor.description]
+            for row in cursor:
+                str_row = ''.join(
+                  f'{f}={str(r)}; ' for r, f in zip(row, fields))
+                log.info(str_row.strip())
+        finally:
+            cursor.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Log file redaction module
+
+Usage: ./redact_log.py [-f FIELD ...] [-r REDACTION] [-s SEPARATOR]
+                       [-c CHUNK_SIZE] SOURCE DESTINATION
+
+Writes a redacted copy of a `key=value;` log file. The source is
+memory-mapped and scrubbed in line-aligned chunks of raw bytes, so
+files larger than memory are never decoded to Python strings.
+"""
+import argparse
+import mmap
+from typing import List
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, get_redactor
+
+
+CHUNK_SIZE: int = 1 << 24
+
+
+def redact_file(
+  source: str, destination: str,
+  fields: List[str] = None, redaction: str = None,
+  separator: str = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Writes a redacted copy of a log file chunk by chunk.
+
+    Args:
+        source: Path of the log file to scrub.
+        destination: Path of the redacted copy.
+        fields: A list of strings for fields to obfuscate.
+        redaction: A string for value to replace fields with.
+        separator: A string for character separating fields in log line.
+        chunk_size: Approximate number of bytes redacted at once.
+
+    Returns:
+        The number of bytes read from the source.
+    """
+    if fields is None:
+        fields = PII_FIELDS
+    if redaction is None:
+        redaction = RedactingFormatter.REDACTION
+    if separator is None:
+        separator = RedactingFormatter.SEPARATOR
+    if chunk_size < 1:
+        raise ValueError("chunk size must be at least 1")
+    redactor = get_redactor(frozenset(fields), redaction, separator)
+
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        src.seek(0, 2)
+        size = src.tell()
+        if size == 0:
+            return 0
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                start = 0
+                while start < size:
+                    # Matches never cross a newline, so cutting right
+                    # after one keeps every field intact.
+                    end = mm.find(b'\n', min(start + chunk_size, size) - 1)
+                    end = size if end == -1 else end + 1
+                    chunk = view[start:end]
+                    try:
+                        dst.write(redactor.redact_bytes(chunk))
+                    finally:
+                        chunk.release()
+                    start = end
+            finally:
+                view.release()
+    return size
+
+
+def main():
+    """
+    Parses the command line and redacts the given log file.
+    """
+    parser = argparse.ArgumentParser(
+      description="Write a redacted copy of a key=value; log file.")
+    parser.add_argument('source')
+    parser.add_argument('destination')
+    parser.add_argument('-f', '--field', action='append', dest='fields',
+                        help="field to obfuscate, PII fields by default")
+    parser.add_argument('-r', '--redaction',
+                        default=RedactingFormatter.REDACTION)
+    parser.add_argument('-s', '--separator',
+                        default=RedactingFormatter.SEPARATOR)
+    parser.add_argument('-c', '--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    redact_file(args.source, args.destination, args.fields,
+                args.redaction, args.separator, args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,75 @@ from os import getenv
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import CORS, cross_origin
-from api.v1.auth.auth import Auth
+from models import json_codec
+from api.v1.auth.auth import Auth, ExcludedPathMatcher
 
 app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 
+try:
+    from flask.json.provider import DefaultJSONProvider
+
+    class CodecJSONProvider(DefaultJSONProvider):
+        """ Encode responses with the shared JSON codec, falling back
+        to Flask's encoder for types the codec doesn't handle
+        """
+
+        def dumps(self, obj, **kwargs) -> str:
+            """ Serialize obj to a JSON string. sort_keys and indent are
+            honored; separators is left to the codec, which is compact
+            (orjson/ujson) or uses the stdlib default; any other
+            argument goes to Flask's encoder.
+            """
+            options = dict(kwargs)
+            sort_keys = options.pop('sort_keys', self.sort_keys)
+            indent = options.pop('indent', None)
+            options.pop('separators', None)
+            if options:
+                return super().dumps(obj, **kwargs)
+            try:
+                return json_codec.dumps(obj, sort_keys, indent)
+            except TypeError:
+                return super().dumps(obj, **kwargs)
+
+        def loads(self, s, **kwargs):
+            """ Deserialize a JSON string or bytes """
+            if kwargs:
+                return super().loads(s, **kwargs)
+            return json_codec.loads(s)
+
+    app.json = CodecJSONProvider(app)
+except ImportError:
+    # Flask < 2.2 (the pinned 1.1.2) has no JSON provider, but encodes
+    # and decodes through the app's JSONEncoder/JSONDecoder classes
+    from flask.json import JSONDecoder, JSONEncoder
+
+    class CodecJSONEncoder(JSONEncoder):
+        """ Encode responses with the shared JSON codec, falling back
+        to Flask's encoder for types the codec doesn't handle
+        """
+
+        def encode(self, o) -> str:
+            """ Serialize o to a JSON string, honoring sort_keys and
+            indent; separators is left to the codec
+            """
+            try:
+                return json_codec.dumps(o, self.sort_keys, self.indent)
+            except TypeError:
+                return super().encode(o)
+
+    class CodecJSONDecoder(JSONDecoder):
+        """ Decode request bodies with the shared JSON codec
+        """
+
+        def decode(self, s, *args):
+            """ Deserialize a JSON string """
+            return json_codec.loads(s)
+
+    app.json_encoder = CodecJSONEncoder
+    app.json_decoder = CodecJSONDecoder
+
 auth = None
 
 if getenv("AUTH_TYPE") == "basic_auth":
@@ -21,6 +84,12 @@ else:
     from api.v1.auth.auth import Auth
     auth = Auth()
 
+# Paths served without authentication, compiled once
+EXCLUDED_PATHS = ExcludedPathMatcher([
+  '/api/v1/status/',
+  '/api/v1/unauthorized/',
+  '/api/v1/forbidden/'])
+
 
 @app.before_request
 def before_request():
@@ -28,11 +97,7 @@ def before_request():
     if auth is None:
         return
 
-    excluded_paths = [
-      '/api/v1/status/',
-      '/api/v1/unauthorized/',
-      '/api/v1/forbidden/']
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
 
     if auth.authorization_header(request) is None:
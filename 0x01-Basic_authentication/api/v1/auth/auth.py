@@ -2,28 +2,72 @@
 """ Module of Authentication
 """
 from flask import request
-from typing import List, TypeVar
+from functools import lru_cache
+from typing import List, Tuple, TypeVar, Union
 import fnmatch
 
 
+class ExcludedPathMatcher:
+    """ Excluded paths compiled once: entries ending with `*` match every
+    path starting with what precedes it, the others match the path
+    itself with or without a trailing slash
+    """
+
+    def __init__(self, excluded_paths: List[str], cache_size: int = 1024):
+        """ Index the exact entries in a set and the wildcard ones in a
+        prefix trie, so a lookup costs O(path length)
+        """
+        self.exact = set()
+        # char -> child node, the `None` key marks the end of a prefix
+        self.prefixes = {}
+        self.size = 0
+        for excluded_path in excluded_paths:
+            if excluded_path.endswith('*'):
+                node = self.prefixes
+                for char in excluded_path.rstrip('*'):
+                    node = node.setdefault(char, {})
+                self.size += None not in node
+                node[None] = True
+            elif excluded_path.rstrip('/') not in self.exact:
+                self.exact.add(excluded_path.rstrip('/'))
+                self.size += 1
+        self.matches = lru_cache(maxsize=cache_size)(self._matches)
+
+    def __len__(self) -> int:
+        """ Number of distinct exclusions
+        """
+        return self.size
+
+    def _matches(self, path: str) -> bool:
+        """ Whether the path is excluded
+        """
+        if path.rstrip('/') in self.exact:
+            return True
+        node = self.prefixes
+        for char in path:
+            if None in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+        return None in node
+
+
 class Auth:
     """ Authentication class """
 
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    def require_auth(
+      self, path: str,
+      excluded_paths: Union[List[str], ExcludedPathMatcher]) -> bool:
         """ Checks if authentication is required for the given path
         """
         if path is None:
             return True
         if excluded_paths is None or len(excluded_paths) == 0:
             return True
-        for excluded_path in excluded_paths:
-            if excluded_path.endswith('*'):
-                pattern = excluded_path.rstrip('*')
-                if path.startswith(pattern):
-                    return False
-            elif path.rstrip('/') == excluded_path.rstrip('/'):
-                return False
-        return True
+        if not isinstance(excluded_paths, ExcludedPathMatcher):
+            excluded_paths = _compile(tuple(excluded_paths))
+        return not excluded_paths.matches(path)
 
     def authorization_header(self, request=None) -> str:
         """ authorization header """
@@ -36,3 +80,10 @@ class Auth:
     def current_user(self, request=None) -> TypeVar('User'):
         """ method to return the user """
         return None
+
+
+@lru_cache(maxsize=32)
+def _compile(excluded_paths: Tuple[str, ...]) -> ExcludedPathMatcher:
+    """ Matcher of a list of excluded paths, built once per list
+    """
+    return ExcludedPathMatcher(excluded_paths)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+""" SQLiteStorage module
+"""
+from models import json_codec
+from models.engine.storage_engine import StorageEngine
+from typing import List, Optional, TypeVar
+import json
+import sqlite3
+import threading
+
+
+class SQLiteStorage(StorageEngine):
+    """ Stores a model class in a SQLite table: one JSON document per
+    object plus one indexed column per `indexed_attributes` entry.
+    The database runs in WAL mode so several processes can share it.
+    """
+
+    def __init__(self, cls: type, db_path: str):
+        """ Initialize the engine of a model class
+        """
+        self.cls = cls
+        self.db_path = db_path
+        self.table = _quote(cls.__name__)
+        self.columns = tuple(cls.indexed_attributes)
+        self._local = threading.local()
+        # Connection only reading PRAGMA data_version, shared by every
+        # thread: it sees the commits of all the other connections
+        self._version_db = None
+        self._version_lock = threading.Lock()
+        self._version = None
+
+        cols = "".join(", {}".format(_quote(c)) for c in self.columns)
+        marks = ", ?" * len(self.columns)
+        updates = "".join("{0} = excluded.{0}, ".format(_quote(c))
+                          for c in self.columns)
+        self._sql_put = (
+            "INSERT INTO {0} (id{1}, data) VALUES (?{2}, ?) "
+            "ON CONFLICT(id) DO UPDATE SET {3}data = excluded.data"
+        ).format(self.table, cols, marks, updates)
+        self._sql_delete = "DELETE FROM {} WHERE id = ?".format(self.table)
+        self._sql_get = "SELECT data FROM {} WHERE id = ?".format(self.table)
+        self._sql_count = "SELECT COUNT(*) FROM {}".format(self.table)
+        self._create_table()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, isolation_level=None,
+                                 check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA busy_timeout=5000")
+            self._local.db = db
+        return db
+
+    def _create_table(self):
+        """ Create the table and its indexes if missing
+        """
+        db = self._db
+        db.execute("CREATE TABLE IF NOT EXISTS {} "
+                   "(id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+                   .format(self.table))
+        existing = {row[1] for row in db.execute(
+            "PRAGMA table_info({})".format(self.table))}
+        for column in self.columns:
+            if column not in existing:
+                db.execute("ALTER TABLE {} ADD COLUMN {}".format(
+                    self.table, _quote(column)))
+            db.execute("CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                _quote("ix_{}_{}".format(self.cls.__name__, column)),
+                self.table, _quote(column)))
+
+    def _load(self, data: str) -> TypeVar('Base'):
+        """ Build an object from its stored JSON document
+        """
+        return self.cls(**json_codec.loads(data))
+
+    def put(self, obj: TypeVar('Base')):
+        """ Insert or update an object
+        """
+        values = [_column_value(getattr(obj, c, None)) for c in self.columns]
+        self._db.execute(self._sql_put,
+                         [obj.id] + values +
+                         [json_codec.dumps(obj.to_json(True))])
+
+    def put_many(self, objs: List[TypeVar('Base')]):
+        """ Insert or update objects in one transaction
+        """
+        db = self._db
+        db.execute("BEGIN")
+        try:
+            for obj in objs:
+                self.put(obj)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def delete(self, obj_id: str):
+        """ Delete an object by ID
+        """
+        self._db.execute(self._sql_delete, (obj_id,))
+
+    def get(self, obj_id: str) -> Optional[TypeVar('Base')]:
+        """ Return one object by ID
+        """
+        row = self._db.execute(self._sql_get, (obj_id,)).fetchone()
+        return None if row is None else self._load(row[0])
+
+    def search(self, attributes: dict) -> List[TypeVar('Base')]:
+        """ Return all objects with matching attributes: indexed ones
+        are filtered by SQLite, the others on the loaded objects
+        """
+        where = []
+        params = []
+        for k, v in attributes.items():
+            if k in self.columns:
+                where.append("{} IS ?".format(_quote(k)))
+                params.append(_column_value(v))
+        sql = "SELECT data FROM {}".format(self.table)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY rowid"
+
+        result = []
+        for (data,) in self._db.execute(sql, params):
+            obj = self._load(data)
+            if all(getattr(obj, k) == v for k, v in attributes.items()):
+                result.append(obj)
+        return result
+
+    def page(self, after: Optional[str],
+             limit: Optional[int]) -> List[TypeVar('Base')]:
+        """ Return up to `limit` objects ordered by ID, starting right
+        after the ID `after`, walking the primary key index
+        """
+        sql = "SELECT data FROM {}".format(self.table)
+        params = []
+        if after is not None:
+            sql += " WHERE id > ?"
+            params.append(after)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._load(data)
+                for (data,) in self._db.execute(sql, params)]
+
+    def count(self) -> int:
+        """ Count all objects
+        """
+        return self._db.execute(self._sql_count).fetchone()[0]
+
+    def changed(self) -> bool:
+        """ Whether a connection committed since the last call, from any
+        thread; True on the very first call
+        """
+        with self._version_lock:
+            if self._version_db is None:
+                self._version_db = sqlite3.connect(
+                    self.db_path, isolation_level=None,
+                    check_same_thread=False)
+            version = self._version_db.execute(
+                "PRAGMA data_version").fetchone()[0]
+            changed = version != self._version
+            self._version = version
+            return changed
+
+
+def _quote(identifier: str) -> str:
+    """ Quote an SQL identifier
+    """
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+def _column_value(value):
+    """ Value stored in an indexed column
+    """
+    if value is None or type(value) in (str, int, float):
+        return value
+    return json.dumps(value, default=str)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+""" StorageEngine module
+"""
+from abc import ABC, abstractmethod
+from typing import List, Optional, TypeVar
+
+
+class StorageEngine(ABC):
+    """ Interface of the engines `Base` delegates persistence to.
+    An engine stores the objects of one model class.
+    """
+
+    @abstractmethod
+    def put(self, obj: TypeVar('Base')):
+        """ Insert or update an object
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_many(self, objs: List[TypeVar('Base')]):
+        """ Insert or update several objects at once
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, obj_id: str):
+        """ Delete an object by ID
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, obj_id: str) -> Optional[TypeVar('Base')]:
+        """ Return one object by ID
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(self, attributes: dict) -> List[TypeVar('Base')]:
+        """ Return all objects with matching attributes
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def page(self, after: Optional[str],
+             limit: Optional[int]) -> List[TypeVar('Base')]:
+        """ Return up to `limit` objects ordered by ID, starting right
+        after the ID `after`
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def count(self) -> int:
+        """ Count all objects
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def changed(self) -> bool:
+        """ Whether the store may have been modified by someone else
+        since the last call
+        """
+        raise NotImplementedError
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+""" JSON codec module
+
+Shared by the API responses and the file/SQLite stores: encodes with
+orjson or ujson when installed, with the standard library otherwise.
+JSON_CODEC forces one of `orjson`, `ujson` or `json`.
+"""
+from os import getenv
+from typing import Any, Callable, Tuple, Union
+import importlib
+import json
+
+
+CODECS: Tuple[str, ...] = ('orjson', 'ujson', 'json')
+NAME: str = 'json'
+
+
+def _codec(name: str) -> Tuple[Callable[..., str], Callable[..., Any]]:
+    """ Return the (dumps, loads) pair of a codec, raise ImportError
+    if its package is not installed. dumps takes the object, sort_keys
+    and indent.
+    """
+    if name not in CODECS:
+        raise ValueError("unknown JSON codec: {}".format(name))
+    if name == 'json':
+        return (lambda obj, sort_keys, indent: json.dumps(
+            obj, sort_keys=sort_keys, indent=indent)), json.loads
+    module = importlib.import_module(name)
+    if name == 'orjson':
+        def orjson_dumps(obj: Any, sort_keys: bool, indent: int) -> str:
+            # orjson only indents by 2 spaces
+            option = (module.OPT_SORT_KEYS if sort_keys else 0) | \
+                (module.OPT_INDENT_2 if indent else 0)
+            return module.dumps(obj, option=option).decode()
+        return orjson_dumps, module.loads
+    return (lambda obj, sort_keys, indent: module.dumps(
+        obj, ensure_ascii=False, sort_keys=sort_keys,
+        indent=indent or 0)), module.loads
+
+
+def use(name: str = None) -> str:
+    """ Select the codec, the fastest installed one by default
+    """
+    global NAME, _dumps, _loads
+    names = CODECS if name is None else (name,)
+    for candidate in names:
+        try:
+            _dumps, _loads = _codec(candidate)
+        except ImportError:
+            if name is not None:
+                raise
+            continue
+        NAME = candidate
+        return NAME
+
+
+def dumps(obj: Any, sort_keys: bool = False, indent: int = None) -> str:
+    """ Serialize an object to a JSON string, optionally with sorted
+    keys and indented
+    """
+    return _dumps(obj, sort_keys, indent)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """ Deserialize a JSON string or UTF-8 bytes
+    """
+    return _loads(data)
+
+
+use(getenv('JSON_CODEC') or None)
@@ -3,12 +3,96 @@
 """
 import base64
 from api.v1.auth.auth import Auth
+from collections import OrderedDict
 from models.user import User
-from typing import TypeVar, Tuple
+from os import getenv
+from typing import Optional, TypeVar, Tuple
+import hashlib
+import os
+import threading
+import time
+
+
+class CredentialCache:
+    """ Bounded TTL cache of verified Authorization headers.
+    Headers are keyed by a hash salted with a per-process secret, so
+    the credentials themselves are never kept. An entry maps to the
+    user ID with the email and password hash it was verified against:
+    once the user is removed or saved with another email or password,
+    the entry no longer matches and is dropped.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60):
+        """ Initialize an empty cache
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, authorization_header: str) -> bytes:
+        """ Keyed hash of a raw Authorization header
+        """
+        return hashlib.blake2b(authorization_header.encode(),
+                               key=self._secret, digest_size=16).digest()
+
+    def get(self, authorization_header: str) -> Optional[TypeVar('User')]:
+        """ User verified for the header, None on a miss
+        """
+        key = self._key(authorization_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] > time.monotonic():
+                self._entries.move_to_end(key)
+            else:
+                entry = None
+        user = None
+        if entry is not None:
+            user = User.get(entry[0])
+            if user is not None and (user.email, user.password) != \
+                    (entry[1], entry[2]):
+                user = None
+        with self._lock:
+            if user is None:
+                self.misses += 1
+                self._entries.pop(key, None)
+            else:
+                self.hits += 1
+        return user
+
+    def put(self, authorization_header: str, user: TypeVar('User')):
+        """ Remember the user verified for the header
+        """
+        key = self._key(authorization_header)
+        entry = (user.id, user.email, user.password,
+                 time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """ Drop every entry
+        """
+        with self._lock:
+            self._entries.clear()
 
 
 class BasicAuth(Auth):
     """ Basic Authentication Class """
+    def __init__(self):
+        """ Initialize the verified-credential cache, sized by
+        BASIC_AUTH_CACHE_SIZE and BASIC_AUTH_CACHE_TTL (seconds)
+        """
+        super().__init__()
+        self.credential_cache = CredentialCache(
+          int(getenv('BASIC_AUTH_CACHE_SIZE', '1024')),
+          float(getenv('BASIC_AUTH_CACHE_TTL', '60')))
+
     def extract_base64_authorization_header(
       self,
       authorization_header: str) -> str:
@@ -73,13 +157,18 @@ class BasicAuth(Auth):
         return None
 
     def current_user(self, request=None) -> TypeVar('User'):
-        """ Retrieves the User instance for a request
+        """ Retrieves the User instance for a request, from the
+        verified-credential cache when the header was seen recently
         """
         if request is None:
             return None
         authorization_header = self.authorization_header(request)
         if authorization_header is None:
             return None
+        if self.credential_cache.max_size > 0:
+            user = self.credential_cache.get(authorization_header)
+            if user is not None:
+                return user
         base64_header = self.extract_base64_authorization_header(
           authorization_header)
         if base64_header is None:
@@ -91,4 +180,6 @@ class BasicAuth(Auth):
         if email is None or password is None:
             return None
         user = self.user_object_from_credentials(email, password)
+        if user is not None and self.credential_cache.max_size > 0:
+            self.credential_cache.put(authorization_header, user)
         return user
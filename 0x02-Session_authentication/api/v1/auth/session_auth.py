@@ -34,23 +34,34 @@ class SessionAuth(Auth):
         session_name = getenv("SESSION_NAME", "_my_session_id")
         return request.cookies.get(session_name)
 
+    def resolve_session(self, request=None) -> dict:
+        """ Return the session ID, User ID and User of a request, looked
+        up on the first call and kept on the request as `auth_session`
+        for the following ones
+        """
+        if request is None:
+            return {'session_id': None, 'user_id': None, 'user': None}
+        resolved = getattr(request, 'auth_session', None)
+        if resolved is None:
+            session_id = self.session_cookie(request)
+            user_id = self.user_id_for_session_id(session_id)
+            user = User.get(user_id) if user_id is not None else None
+            resolved = {
+                'session_id': session_id, 'user_id': user_id, 'user': user}
+            request.auth_session = resolved
+        return resolved
+
     def current_user(self, request=None) -> Optional[User]:
         """ Return a User instance based on a cookie value """
-        session_id = self.session_cookie(request)
-        user_id = self.user_id_for_session_id(session_id)
-        if user_id is not None:
-            return User.get(user_id)
-        return None
+        return self.resolve_session(request)['user']
 
     def destroy_session(self, request=None):
         """ Deletes the user session / logout """
         if request is None:
             return False
-        session_id = self.session_cookie(request)
-        if session_id is None:
-            return False
-        user_id = self.user_id_for_session_id(session_id)
-        if user_id is None:
+        resolved = self.resolve_session(request)
+        if resolved['session_id'] is None or resolved['user_id'] is None:
             return False
-        self.user_id_by_session_id.pop(session_id, None)
+        self.user_id_by_session_id.pop(resolved['session_id'], None)
+        resolved['user_id'] = resolved['user'] = None
         return True
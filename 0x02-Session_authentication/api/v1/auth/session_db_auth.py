@@ -27,7 +27,7 @@ class SessionDBAuth(SessionExpAuth):
             return None
         user_id = super().user_id_for_session_id(session_id)
         if user_id:
-            session = UserSession.get(session_id)
+            session = self._user_session(session_id)
             if session:
                 session.updated_at = datetime.utcnow()
                 session.save()
@@ -39,12 +39,20 @@ class SessionDBAuth(SessionExpAuth):
          from the request cookie """
         if request is None:
             return False
-        session_id = self.session_cookie(request)
-        if session_id:
-            user_id = self.user_id_for_session_id(session_id)
-            if user_id:
-                session = UserSession.get(session_id)
-                if session:
-                    session.remove()
-                    return True
+        resolved = self.resolve_session(request)
+        session_id = resolved['session_id']
+        if session_id and resolved['user_id']:
+            session = self._user_session(session_id)
+            if session:
+                session.remove()
+                self.user_id_by_session_id.pop(session_id, None)
+                resolved['user_id'] = resolved['user'] = None
+                return True
         return False
+
+    def _user_session(self, session_id: str) -> Optional[UserSession]:
+        """ Return the UserSession of a Session ID, found through the
+        `session_id` index (it is not the UserSession ID)
+        """
+        sessions = UserSession.search({'session_id': session_id})
+        return sessions[0] if sessions else None
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """ Session Authentication Exp Module """
 from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_store import SessionStore
 from datetime import datetime, timedelta
 import os
 
@@ -16,6 +17,14 @@ class SessionExpAuth(SessionAuth):
             self.session_duration = int(session_duration)
         except (ValueError, TypeError):
             self.session_duration = 0
+        # Sessions expire from memory after session_duration seconds,
+        # at most SESSION_MAX_COUNT are kept (least recently used
+        # evicted first, no limit if 0), and expired ones are swept
+        # every SESSION_SWEEP_INTERVAL seconds
+        self.user_id_by_session_id = SessionStore(
+          self.session_duration,
+          _env_int("SESSION_MAX_COUNT", 100000),
+          _env_int("SESSION_SWEEP_INTERVAL", 60))
 
     def create_session(self, user_id=None):
         """ Create a Session ID with expiration """
@@ -30,10 +39,11 @@ class SessionExpAuth(SessionAuth):
 
     def user_id_for_session_id(self, session_id=None):
         """ Get user ID from Session ID with expiration """
-        if session_id is None or session_id not in self.user_id_by_session_id:
+        if session_id is None:
+            return None
+        session_dict = self.user_id_by_session_id.get(session_id)
+        if session_dict is None:
             return None
-
-        session_dict = self.user_id_by_session_id[session_id]
         if self.session_duration <= 0:
             return session_dict.get("user_id")
 
@@ -46,3 +56,13 @@ class SessionExpAuth(SessionAuth):
             return None
 
         return session_dict.get("user_id")
+
+
+def _env_int(name: str, default: int) -> int:
+    """ Integer value of an environment variable, default if unset or
+    invalid
+    """
+    try:
+        return int(os.getenv(name))
+    except (ValueError, TypeError):
+        return default
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+""" Module of the in-memory session store
+"""
+from collections import OrderedDict
+from typing import Any
+import heapq
+import threading
+import time
+
+
+_MISSING = object()
+
+
+class SessionStore:
+    """ Sessions kept in memory, indexed by Session ID.
+    Entries live in an ordered dict (O(1) lookup, least recently used
+    first) and their expiry times in a min-heap, which a background
+    thread pops to evict expired sessions. Past `max_sessions`, the
+    least recently used session is evicted.
+    """
+
+    # Most expired sessions evicted while holding the lock at once
+    sweep_batch: int = 1000
+
+    def __init__(self, ttl: float = 0, max_sessions: int = 0,
+                 sweep_interval: float = 60):
+        """ Initialize an empty store: sessions expire `ttl` seconds
+        after being set (never if 0), at most `max_sessions` are kept
+        (no limit if 0) and expired ones are swept every
+        `sweep_interval` seconds
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        # Session ID -> (value, expiry time or None)
+        self._entries = OrderedDict()
+        # (expiry time, Session ID), may hold stale pairs of sessions
+        # since removed or set again
+        self._expiry = []
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stopped = threading.Event()
+
+    def __setitem__(self, session_id: str, value: Any):
+        """ Set a session, resetting its expiry time
+        """
+        expires_at = None
+        if self.ttl > 0:
+            expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[session_id] = (value, expires_at)
+            self._entries.move_to_end(session_id)
+            if expires_at is not None:
+                heapq.heappush(self._expiry, (expires_at, session_id))
+                if len(self._expiry) > 2 * len(self._entries) + 64:
+                    self._compact()
+            while 0 < self.max_sessions < len(self._entries):
+                self._entries.popitem(last=False)
+            if expires_at is not None:
+                self._start_sweeper()
+
+    def __getitem__(self, session_id: str) -> Any:
+        """ Value of a live session, KeyError otherwise
+        """
+        value = self.get(session_id, _MISSING)
+        if value is _MISSING:
+            raise KeyError(session_id)
+        return value
+
+    def __contains__(self, session_id: str) -> bool:
+        """ Whether a session is live
+        """
+        return self.get(session_id, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        """ Number of sessions held, expired ones not swept yet included
+        """
+        return len(self._entries)
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """ Value of a live session, default otherwise. An expired
+        session is evicted on the spot.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return default
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                del self._entries[session_id]
+                return default
+            self._entries.move_to_end(session_id)
+            return entry[0]
+
+    def pop(self, session_id: str, default: Any = None) -> Any:
+        """ Remove a session and return its value, default if missing
+        """
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+        return default if entry is None else entry[0]
+
+    def sweep(self) -> int:
+        """ Evict the expired sessions, `sweep_batch` at a time so
+        lookups never wait long for the lock. Return how many were
+        evicted.
+        """
+        evicted = 0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                popped = 0
+                while self._expiry and self._expiry[0][0] <= now and \
+                        popped < self.sweep_batch:
+                    expires_at, session_id = heapq.heappop(self._expiry)
+                    popped += 1
+                    entry = self._entries.get(session_id)
+                    if entry is not None and entry[1] == expires_at:
+                        del self._entries[session_id]
+                        evicted += 1
+            if popped < self.sweep_batch:
+                return evicted
+
+    def stop(self):
+        """ Stop the sweeper thread
+        """
+        self._stopped.set()
+
+    def _compact(self):
+        """ Rebuild the expiry heap without stale pairs
+        """
+        self._expiry = [(expires_at, session_id) for session_id,
+                        (_, expires_at) in self._entries.items()
+                        if expires_at is not None]
+        heapq.heapify(self._expiry)
+
+    def _start_sweeper(self):
+        """ Start the sweeper thread on the first expiring session
+        """
+        if self._sweeper is not None or self.sweep_interval <= 0:
+            return
+        self._sweeper = threading.Thread(
+          target=self._sweep_loop, name='session-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def _sweep_loop(self):
+        """ Sweep every `sweep_interval` seconds until stopped
+        """
+        while not self._stopped.wait(self.sweep_interval):
+            self.sweep()
@@ -2,19 +2,90 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
+from models import json_codec
 from models.user import User
-from flask import request
+from urllib.parse import urlencode
+import hashlib
+
+PAGE_SIZE = 100
+# Largest page a client may ask for, larger limits are clamped to it
+MAX_PAGE_SIZE = 1000
+# (User generation, encoded body, ETag) of the last full listing
+_all_users_cache = (None, None, None)
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: page size, at most MAX_PAGE_SIZE, pages are ordered
+        by User ID
+      - after: ID of the last User of the previous page
+      - stream: if 1, stream the whole list in chunks
     Return:
-      - list of all User objects JSON represented
+      - list of all User objects JSON represented, 304 if it still
+        matches the `If-None-Match` ETag
+      - with limit/after, one page and a `Link` header to the next one
+      - 400 if limit is not a positive integer
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    if request.args.get('stream') == '1':
+        return Response(_stream_users(), mimetype='application/json')
+
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    if limit is None and after is None:
+        return _all_users_response()
+
+    try:
+        limit = PAGE_SIZE if limit is None else int(limit)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return jsonify({'error': "limit must be a positive integer"}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
+    users = User.page(after, limit)
+    response = jsonify([user.to_json() for user in users])
+    if len(users) == limit:
+        response.headers['Link'] = '<{}?{}>; rel="next"'.format(
+          request.base_url, urlencode({'limit': limit, 'after': users[-1].id}))
+    return response
+
+
+def _all_users_response() -> Response:
+    """ Full listing, encoded once per User generation and reused
+    until a User is saved or removed
+    """
+    global _all_users_cache
+    generation = User.generation()
+    cached_generation, body, etag = _all_users_cache
+    if cached_generation != generation:
+        all_users = [user.to_json() for user in User.all()]
+        body = (json_codec.dumps(all_users) + "\n").encode()
+        etag = hashlib.sha1(body).hexdigest()
+        _all_users_cache = (generation, body, etag)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def _stream_users():
+    """ Yield the JSON array of all users one page at a time
+    """
+    yield '['
+    after = None
+    separator = ''
+    while True:
+        users = User.page(after, PAGE_SIZE)
+        if len(users) == 0:
+            break
+        yield separator + ','.join(
+          json_codec.dumps(u.to_json()) for u in users)
+        separator = ','
+        after = users[-1].id
+        if len(users) < PAGE_SIZE:
+            break
+    yield ']'
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -23,19 +94,24 @@ def view_one_user(user_id: str = None) -> str:
     Path parameter:
       - User ID
     Return:
-      - User object JSON represented
+      - User object JSON represented, 304 if it still matches the
+        `If-None-Match` ETag
       - 404 if the User ID doesn't exist
     """
     if user_id is None:
         abort(404)
     if user_id == "me":
-        if auth.current_user(request) is None:
+        # resolved once by before_request for the whole request
+        current_user = getattr(request, 'current_user', None)
+        if current_user is None:
             abort(404)
-        return jsonify(auth.current_user(request).to_json())
+        return jsonify(current_user.to_json())
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    response = jsonify(user.to_json())
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the JSON codecs on user payloads
+
+Usage: ./benchmark_json.py [users] [repeat]
+
+Times json_codec.dumps/loads with every installed backend on the
+payload of GET /api/v1/users and on the lines of the file store.
+"""
+import sys
+import time
+from typing import Callable, List
+
+from models import json_codec
+from models.user import User
+
+
+def make_users(count: int) -> List[User]:
+    """ Builds unsaved users with every field set """
+    users = []
+    for i in range(count):
+        user = User()
+        user.email = 'user{}@example.com'.format(i)
+        user.password = 'pwd{}'.format(i)
+        user.first_name = 'First{}'.format(i)
+        user.last_name = 'Last{}'.format(i)
+        users.append(user)
+    return users
+
+
+def measure(name: str, func: Callable, items: int, repeat: int) -> None:
+    """ Runs func repeat times and prints the best throughput """
+    func()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print('{:<40} {:>14,.0f} users/s'.format(name, items / best))
+
+
+def bench(codec: str, users: List[User], repeat: int) -> None:
+    """ Response and store round trips with one codec """
+    json_codec.use(codec)
+    payload = [user.to_json() for user in users]
+    records = [user.to_json(True) for user in users]
+    body = json_codec.dumps(payload)
+    lines = [json_codec.dumps(record) for record in records]
+    count = len(users)
+    measure('{} dumps list response'.format(codec),
+            lambda: json_codec.dumps(payload), count, repeat)
+    measure('{} loads list response'.format(codec),
+            lambda: json_codec.loads(body), count, repeat)
+    measure('{} dumps store lines'.format(codec),
+            lambda: [json_codec.dumps(r) for r in records], count, repeat)
+    measure('{} loads store lines'.format(codec),
+            lambda: [json_codec.loads(line) for line in lines], count, repeat)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    users = make_users(count)
+    for codec in json_codec.CODECS:
+        try:
+            bench(codec, users, repeat)
+        except ImportError:
+            print('{:<40} {:>14}'.format(codec, 'not installed'))
@@ -2,39 +2,103 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import TypeVar, List, Iterable, Iterator, Optional, Tuple
+from contextlib import contextmanager
+from models import json_codec
+from models.engine.sqlite_storage import SQLiteStorage
+from os import getenv, path
+import atexit
+import bisect
+import os
+import signal
+import threading
 import uuid
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+LAZY = {}
+INDEXES = {}
+SORTED_IDS = {}
+JOURNAL_SIZES = {}
+PENDING = {}
+FILE_STATES = {}
+FILE_LOCKS = {}
+ENGINES = {}
+GENERATIONS = {}
+_LOCK = threading.RLock()
+_flush_hooks_installed = False
+# Set on SIGTERM: write-behind mutations are then persisted right away
+_terminating = threading.Event()
 
 
 class Base():
     """ Base class
     """
 
+    # Models declare their fields in __slots__ so instances carry no
+    # __dict__; `to_json` serializes the declared fields directly and
+    # keeps the public form in `_json_cache` until an attribute is set
+    __slots__ = ('id', 'created_at', 'updated_at', '_json_cache')
+    _public_fields: Tuple[str, ...] = ()
+    _all_fields: Tuple[str, ...] = ()
+
+    # Attributes with a secondary hash index, used by `search`
+    indexed_attributes: Tuple[str, ...] = ()
+    # Both file backends append each write to .db_<Class>.journal, then
+    # 'file' also rewrites .db_<Class>.json while 'journal' only does
+    # so when compacting every N records; 'sqlite' delegates to
+    # SQLiteStorage (also forced for every class by
+    # STORAGE_ENGINE=sqlite)
+    storage: str = 'file'
+    journal_compaction: int = 1000
+    # Write-behind: if > 0, writes are persisted by a background flush at
+    # most every `write_behind` seconds or after `write_behind_max` writes
+    write_behind: float = 0
+    write_behind_max: int = 100
+    # Lazy load: only index the snapshot at load time and build each
+    # object on first access
+    lazy_load: bool = getenv('LAZY_LOAD') == '1'
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
+        if INDEXES.get(s_class) is None:
+            self.__class__._reset_indexes()
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
+        # TIMESTAMP_FORMAT is ISO 8601, which fromisoformat/isoformat
+        # handle far faster than strptime/strftime
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = datetime.fromisoformat(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = datetime.fromisoformat(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
+    def __init_subclass__(cls, **kwargs):
+        """ Collect the slot fields declared by a model class
+        """
+        super().__init_subclass__(**kwargs)
+        fields = []
+        for klass in reversed(cls.__mro__[:-1]):
+            if klass is Base:
+                continue
+            for name in klass.__dict__.get('__slots__', ()):
+                if name not in fields and name != '__dict__':
+                    fields.append(name)
+        cls._all_fields = tuple(fields)
+        cls._public_fields = tuple(f for f in fields if f[0] != '_')
+
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
         """
@@ -44,69 +108,606 @@ class Base():
             return False
         return (self.id == other.id)
 
+    def __setattr__(self, name: str, value):
+        """ Set an attribute, dropping the cached JSON form
+        """
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_json_cache', None)
+
     def to_json(self, for_serialization: bool = False) -> dict:
-        """ Convert the object a JSON dictionary
+        """ Convert the object a JSON dictionary. The public form is
+        built once and reused until an attribute is set; the form with
+        private fields, only used to persist, is never kept.
         """
-        result = {}
-        for key, value in self.__dict__.items():
+        if for_serialization:
+            return self._build_json(True)
+        result = self._json_cache
+        if type(result) is not dict:
+            # a write while building resets the marker, and the then
+            # outdated result is not kept
+            marker = object()
+            object.__setattr__(self, '_json_cache', marker)
+            result = self._build_json(False)
+            if self._json_cache is marker:
+                object.__setattr__(self, '_json_cache', result)
+        return dict(result)
+
+    def _build_json(self, for_serialization: bool) -> dict:
+        """ Serialize the current attributes of the object
+        """
+        result = {
+            'id': self.id,
+            'created_at': self.created_at.isoformat(timespec='seconds'),
+            'updated_at': self.updated_at.isoformat(timespec='seconds'),
+        }
+        if for_serialization:
+            fields = self._all_fields
+        else:
+            fields = self._public_fields
+        for key in fields:
+            result[key] = getattr(self, key, None)
+
+        # attributes of models declared without __slots__
+        for key, value in getattr(self, '__dict__', {}).items():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+                result[key] = value.isoformat(timespec='seconds')
             else:
                 result[key] = value
         return result
 
+    @classmethod
+    def generation(cls) -> int:
+        """ Counter bumped whenever an object of the class is saved or
+        removed, in this process or in another one sharing the store
+        """
+        engine = cls._engine()
+        if engine is not None:
+            if engine.changed():
+                cls._bump_generation()
+        else:
+            cls._refresh()
+        return GENERATIONS.get(cls.__name__, 0)
+
+    @classmethod
+    def _bump_generation(cls):
+        """ Mark the objects of the class as changed
+        """
+        with _LOCK:
+            GENERATIONS[cls.__name__] = GENERATIONS.get(cls.__name__, 0) + 1
+
+    @classmethod
+    def _new_indexes(cls) -> dict:
+        """ Empty secondary indexes for the class
+        """
+        # attribute -> (value -> ordered ids, id -> indexed value)
+        return {attr: ({}, {}) for attr in cls.indexed_attributes}
+
+    @classmethod
+    def _reset_indexes(cls):
+        """ Empty the secondary indexes of the class
+        """
+        INDEXES[cls.__name__] = cls._new_indexes()
+
+    @classmethod
+    def _index_remove(cls, obj_id: str, indexes: dict = None):
+        """ Drop an object ID from the secondary indexes
+        """
+        if indexes is None:
+            indexes = INDEXES[cls.__name__]
+        for ids_by_value, value_by_id in indexes.values():
+            if obj_id not in value_by_id:
+                continue
+            _unindex(ids_by_value, value_by_id.pop(obj_id), obj_id)
+
+    @classmethod
+    def _index_add(cls, obj: TypeVar('Base'), indexes: dict = None):
+        """ Index an object under its current attribute values
+        """
+        cls._index_values(obj.id, {
+            attr: getattr(obj, attr, None)
+            for attr in cls.indexed_attributes}, indexes)
+
+    @classmethod
+    def _index_values(cls, obj_id: str, values: dict, indexes: dict = None):
+        """ Index an object ID under the given attribute values, in
+        place of the ones it was indexed under. The new entry goes in
+        before the old one is dropped, so readers, which don't take the
+        lock, always find the object.
+        """
+        if indexes is None:
+            indexes = INDEXES[cls.__name__]
+        for attr, (ids_by_value, value_by_id) in indexes.items():
+            value = values.get(attr)
+            indexed = obj_id in value_by_id
+            old = value_by_id.get(obj_id)
+            try:
+                ids_by_value.setdefault(value, {})[obj_id] = None
+                value_by_id[obj_id] = value
+                added = True
+            except TypeError:
+                added = False
+            if indexed and (not added or old != value):
+                _unindex(ids_by_value, old, obj_id)
+                if not added:
+                    del value_by_id[obj_id]
+
+    @classmethod
+    def _engine(cls) -> Optional[SQLiteStorage]:
+        """ Storage engine of the class, None for the file backends
+        """
+        s_class = cls.__name__
+        if s_class not in ENGINES:
+            engine = None
+            if cls.storage == 'sqlite' or \
+                    getenv('STORAGE_ENGINE') == 'sqlite':
+                engine = SQLiteStorage(
+                    cls, getenv('SQLITE_DB_PATH', '.db.sqlite'))
+            ENGINES[s_class] = engine
+        return ENGINES[s_class]
+
+    @classmethod
+    @contextmanager
+    def _locked(cls):
+        """ Hold the process lock and the advisory file lock of the class
+        """
+        s_class = cls.__name__
+        with _LOCK:
+            held = FILE_LOCKS.get(s_class)
+            if held is not None:
+                held[1] += 1
+                try:
+                    yield
+                finally:
+                    held[1] -= 1
+                return
+
+            lock_file = open(".db_{}.lock".format(s_class), 'a')
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            FILE_LOCKS[s_class] = [lock_file, 0]
+            try:
+                yield
+            finally:
+                del FILE_LOCKS[s_class]
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from file, replaying the journal if any.
+        With a storage engine, only imports the JSON file into an
+        empty store.
         """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        engine = cls._engine()
+        if engine is not None:
+            if engine.count() == 0 and path.exists(file_path):
+                with open(file_path, 'rb') as f:
+                    engine.put_many([cls(**obj_json) for _, _, obj_json
+                                     in _snapshot_entries(f)])
+                cls._bump_generation()
+            return
+
+        with cls._locked():
+            cls.flush()
+            # Built aside and swapped in at the end: readers don't take
+            # the lock and must never see the store half loaded
+            data = {}
+            lazy = {}
+            indexes = cls._new_indexes()
+            state = {'snapshot': None, 'journal': 0, 'token': None}
+            if path.exists(file_path):
+                with open(file_path, 'rb') as f:
+                    state['snapshot'] = _file_signature(os.fstat(f.fileno()))
+                    for offset, obj_id, obj_json in _snapshot_entries(f):
+                        if cls.lazy_load and offset is not None:
+                            lazy[obj_id] = offset
+                            cls._index_values(obj_id, obj_json, indexes)
+                        else:
+                            obj = cls(**obj_json)
+                            data[obj_id] = obj
+                            cls._index_add(obj, indexes)
+            journal_path = ".db_{}.journal".format(s_class)
+            records = 0
+            if state['snapshot'] is not None:
+                records = _skip_covered(journal_path, state)
+            records += cls._replay_journal((data, lazy, indexes, state))
+            DATA[s_class] = data
+            LAZY[s_class] = lazy
+            INDEXES[s_class] = indexes
+            SORTED_IDS.pop(s_class, None)
+            FILE_STATES[s_class] = state
+            JOURNAL_SIZES[s_class] = records
+            cls._bump_generation()
+
+    @classmethod
+    def _materialize(cls, obj_id: str) -> Optional[TypeVar('Base')]:
+        """ Build a lazily loaded object from the snapshot
+        """
+        s_class = cls.__name__
+        with cls._locked():
+            cls._refresh()
+            offset = LAZY.get(s_class, {}).pop(obj_id, None)
+            if offset is None:
+                return DATA[s_class].get(obj_id)
+            with open(".db_{}.json".format(s_class), 'rb') as f:
+                f.seek(offset)
+                _, obj_json = _parse_entry(f.readline())
+            obj = cls(**obj_json)
+            DATA[s_class][obj_id] = obj
+            return obj
+
+    @classmethod
+    def _materialize_all(cls):
+        """ Build every lazily loaded object in one pass over the
+        snapshot, under a single lock
+        """
+        s_class = cls.__name__
+        if not LAZY.get(s_class):
             return
+        with cls._locked():
+            cls._refresh()
+            lazy = LAZY.get(s_class)
+            if not lazy:
+                return
+            data = DATA[s_class]
+            # in file order, so the reads only move forward
+            entries = sorted(lazy.items(), key=lambda entry: entry[1])
+            with open(".db_{}.json".format(s_class), 'rb') as f:
+                for obj_id, offset in entries:
+                    f.seek(offset)
+                    _, obj_json = _parse_entry(f.readline())
+                    data[obj_id] = cls(**obj_json)
+            # readers don't take the lock: every object is in DATA
+            # before LAZY is emptied
+            LAZY[s_class] = {}
+
+    @classmethod
+    def _replay_journal(cls, store: tuple = None) -> int:
+        """ Apply the journal records written since the last replay to
+        `store`, a (data, lazy, indexes, file state) tuple, the live
+        store of the class by default. Return the number of records
+        applied.
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.journal".format(s_class)
+        if store is None:
+            store = (DATA[s_class], LAZY.setdefault(s_class, {}),
+                     INDEXES[s_class], FILE_STATES[s_class])
+        data, lazy, indexes, state = store
+        if not path.exists(journal_path):
+            return 0
+
+        applied = 0
+        with open(journal_path, 'rb+') as f:
+            f.seek(state['journal'])
+            for line in f:
+                try:
+                    record = json_codec.loads(line)
+                except ValueError:
+                    # torn last record of an interrupted append
+                    f.truncate(state['journal'])
+                    break
+                state['journal'] += len(line)
+                obj_id = record['id']
+                if record['op'] == 'start':
+                    state['token'] = obj_id
+                    continue
+                if record['op'] == 'snapshot':
+                    continue
+                if record['op'] == 'put':
+                    obj = cls(**record['obj'])
+                    data[obj_id] = obj
+                    cls._index_add(obj, indexes)
+                else:
+                    data.pop(obj_id, None)
+                    cls._index_remove(obj_id, indexes)
+                lazy.pop(obj_id, None)
+                applied += 1
+        if applied:
+            SORTED_IDS.pop(s_class, None)
+        return applied
+
+    @classmethod
+    def _refresh(cls):
+        """ Pick up what other processes wrote since the last load.
+        Writers append every mutation to the journal before rewriting
+        the snapshot, so as long as the journal was only appended to
+        (same token), replaying its new records is enough, even if the
+        snapshot changed. A compacted journal, or a new snapshot while
+        objects are still lazily loaded from the old one, triggers a
+        full reload. Skipped while write-behind mutations are pending.
+        """
+        s_class = cls.__name__
+        state = FILE_STATES.get(s_class)
+        if state is None or s_class in PENDING or \
+                ENGINES.get(s_class) is not None:
+            return
+        file_path = ".db_{}.json".format(s_class)
+        journal_path = ".db_{}.journal".format(s_class)
+        if _path_signature(file_path) == state['snapshot'] and \
+                _path_size(journal_path) == state['journal']:
+            return
+
+        with cls._locked():
+            cls._sync()
+
+    @classmethod
+    def _sync(cls) -> bool:
+        """ Under the lock, catch up with the writes of other processes.
+        Return whether anything was replayed or reloaded.
+        """
+        s_class = cls.__name__
+        state = FILE_STATES[s_class]
+        file_path = ".db_{}.json".format(s_class)
+        journal_path = ".db_{}.journal".format(s_class)
+        snapshot = _path_signature(file_path)
+        journal_size = _path_size(journal_path)
+        if snapshot == state['snapshot']:
+            if journal_size == state['journal']:
+                return False
+            incremental = journal_size > state['journal']
+        else:
+            incremental = journal_size > state['journal'] and \
+                state['token'] is not None and \
+                not LAZY.get(s_class) and \
+                _journal_token(journal_path) == state['token']
+        if not incremental:
+            cls.load_from_file()
+            return True
+        applied = cls._replay_journal()
+        state['snapshot'] = snapshot
+        JOURNAL_SIZES[s_class] = JOURNAL_SIZES.get(s_class, 0) + applied
+        if applied:
+            cls._bump_generation()
+        return applied > 0
+
+    @classmethod
+    def _append_journal(cls, records: List[dict]):
+        """ Append put/delete records. A new journal starts with a
+        `start` record holding a random token, which tells readers it
+        is not the journal they replayed before a compaction.
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.journal".format(s_class)
+        with cls._locked():
+            with open(journal_path, 'a') as f:
+                token = None
+                if f.tell() == 0:
+                    token = str(uuid.uuid4())
+                    records = [{'op': 'start', 'id': token}] + records
+                f.write("".join(
+                    json_codec.dumps(r) + "\n" for r in records))
+                f.flush()
+                os.fsync(f.fileno())
+                state = FILE_STATES.get(s_class)
+                if state is not None:
+                    state['journal'] = f.tell()
+                    if token is not None:
+                        state['token'] = token
+            JOURNAL_SIZES[s_class] = JOURNAL_SIZES.get(s_class, 0) + \
+                len(records) - (token is not None)
+
+    @classmethod
+    def _write(cls, records: List[dict]):
+        """ Persist mutation records: append them to the journal, then
+        rewrite the snapshot with the 'file' storage, or compact once
+        the journal holds `journal_compaction` records
+        """
+        s_class = cls.__name__
+        with cls._locked():
+            if s_class in FILE_STATES:
+                # _refresh is skipped while write-behind mutations are
+                # pending: catch up with the other processes before the
+                # snapshot is rewritten from DATA, then put back the
+                # objects of these records, appended after theirs
+                objs = {r['id']: DATA[s_class].get(r['id'])
+                        for r in records}
+                if cls._sync():
+                    cls._restore(objs)
+            cls._append_journal(records)
+            if JOURNAL_SIZES[s_class] >= cls.journal_compaction:
+                cls.save_to_file()
+            elif cls.storage != 'journal':
+                cls._write_snapshot()
+                cls._mark_snapshot()
+
+    @classmethod
+    def _restore(cls, objs: dict):
+        """ Make DATA hold these objects again, by ID, None to remove
+        """
+        s_class = cls.__name__
+        for obj_id, obj in objs.items():
+            LAZY.get(s_class, {}).pop(obj_id, None)
+            if obj is None:
+                DATA[s_class].pop(obj_id, None)
+                cls._index_remove(obj_id)
+            else:
+                DATA[s_class][obj_id] = obj
+                cls._index_add(obj)
+        SORTED_IDS.pop(s_class, None)
+        cls._bump_generation()
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def _mark_snapshot(cls):
+        """ Append a `snapshot` record naming the version of the snapshot
+        just written: at load, the records before it are already in the
+        snapshot and are skipped. Not fsynced, as losing it only means
+        replaying more.
+        """
+        s_class = cls.__name__
+        state = FILE_STATES[s_class]
+        record = {'op': 'snapshot', 'id': list(state['snapshot'])}
+        with open(".db_{}.journal".format(s_class), 'a') as f:
+            f.write(json_codec.dumps(record) + "\n")
+            state['journal'] = f.tell()
 
     @classmethod
     def save_to_file(cls):
-        """ Save all objects to file
+        """ Save all objects to file, then empty the journal it covers
+        """
+        s_class = cls.__name__
+        if cls._engine() is not None:
+            return
+        with cls._locked():
+            cls._write_snapshot()
+            journal_path = ".db_{}.journal".format(s_class)
+            if path.exists(journal_path):
+                open(journal_path, 'w').close()
+            JOURNAL_SIZES[s_class] = 0
+            FILE_STATES[s_class] = {
+                'snapshot': FILE_STATES[s_class]['snapshot'],
+                'journal': 0, 'token': None}
+
+    @classmethod
+    def _write_snapshot(cls):
+        """ Write all objects to file, replaced atomically by a fsynced
+        temporary copy. It stays a JSON object, written one object per
+        line so it can be streamed and lazily loaded; objects never
+        materialized are copied verbatim from the previous snapshot.
         """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        tmp_path = "{}.{}.tmp".format(file_path, os.getpid())
+
+        with cls._locked():
+            lazy = LAZY.get(s_class, {})
+            offsets = {}
+            src = open(file_path, 'rb') if lazy else None
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(b"{")
+                    separator = b"\n"
+                    for obj_id, obj in DATA[s_class].items():
+                        f.write(separator)
+                        f.write(_format_entry(obj_id, obj.to_json(True)))
+                        separator = b",\n"
+                    for obj_id, offset in lazy.items():
+                        f.write(separator)
+                        offsets[obj_id] = f.tell()
+                        src.seek(offset)
+                        f.write(src.readline().rstrip(b",\n"))
+                        separator = b",\n"
+                    f.write(b"\n}\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                if src is not None:
+                    src.close()
+            os.replace(tmp_path, file_path)
+            if lazy:
+                LAZY[s_class] = offsets
+            state = FILE_STATES.setdefault(
+                s_class, {'snapshot': None, 'journal': 0, 'token': None})
+            state['snapshot'] = _path_signature(file_path)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def _persist(cls, record: dict):
+        """ Persist one mutation now, or queue it for write-behind
+        """
+        if cls.write_behind <= 0:
+            cls._write([record])
+            return
+
+        s_class = cls.__name__
+        with _LOCK:
+            _install_flush_hooks()
+            pending = PENDING.get(s_class)
+            if pending is None:
+                pending = {'cls': cls, 'count': 0,
+                           'records': [], 'timer': None}
+                PENDING[s_class] = pending
+            pending['count'] += 1
+            pending['records'].append(record)
+            if pending['count'] >= cls.write_behind_max or \
+                    _terminating.is_set():
+                cls.flush()
+            elif pending['timer'] is None:
+                pending['timer'] = threading.Timer(
+                    cls.write_behind, cls.flush)
+                pending['timer'].daemon = True
+                pending['timer'].start()
+
+    @classmethod
+    def flush(cls):
+        """ Persist the write-behind mutations of the class, if any
+        """
+        with _LOCK:
+            if cls.__name__ not in PENDING:
+                return
+        with cls._locked():
+            pending = PENDING.pop(cls.__name__, None)
+            if pending is None:
+                return
+            if pending['timer'] is not None:
+                pending['timer'].cancel()
+            cls._write(pending['records'])
+
+    @staticmethod
+    def flush_all():
+        """ Persist the write-behind mutations of every class
+        """
+        with _LOCK:
+            for pending in list(PENDING.values()):
+                pending['cls'].flush()
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        engine = self.__class__._engine()
+        if engine is not None:
+            self.updated_at = datetime.utcnow()
+            engine.put(self)
+            self.__class__._bump_generation()
+            return
+        with self.__class__._locked():
+            self.__class__._refresh()
+            self.updated_at = datetime.utcnow()
+            if self.id not in DATA[s_class] and \
+                    self.id not in LAZY.get(s_class, ()):
+                SORTED_IDS.pop(s_class, None)
+            DATA[s_class][self.id] = self
+            LAZY.get(s_class, {}).pop(self.id, None)
+            self.__class__._index_add(self)
+            self.__class__._bump_generation()
+            self.__class__._persist(
+                {'op': 'put', 'id': self.id, 'obj': self.to_json(True)})
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        engine = self.__class__._engine()
+        if engine is not None:
+            engine.delete(self.id)
+            self.__class__._bump_generation()
+            return
+        with self.__class__._locked():
+            self.__class__._refresh()
+            lazy = LAZY.get(s_class, {})
+            if DATA[s_class].get(self.id) is not None or self.id in lazy:
+                DATA[s_class].pop(self.id, None)
+                lazy.pop(self.id, None)
+                SORTED_IDS.pop(s_class, None)
+                self.__class__._index_remove(self.id)
+                self.__class__._bump_generation()
+                self.__class__._persist({'op': 'del', 'id': self.id})
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        engine = cls._engine()
+        if engine is not None:
+            return engine.count()
+        cls._refresh()
+        return len(DATA[s_class].keys()) + len(LAZY.get(s_class, ()))
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -114,18 +715,57 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Return up to `limit` objects ordered by ID, starting right
+        after the ID `after`
+        """
+        s_class = cls.__name__
+        engine = cls._engine()
+        if engine is not None:
+            return engine.page(after, limit)
+        cls._refresh()
+        ids = SORTED_IDS.get(s_class)
+        if ids is None:
+            ids = sorted(list(DATA[s_class]) + list(LAZY.get(s_class, ())))
+            SORTED_IDS[s_class] = ids
+        start = 0 if after is None else bisect.bisect_right(ids, after)
+        end = len(ids) if limit is None else start + limit
+
+        result = []
+        for obj_id in ids[start:end]:
+            obj = DATA[s_class].get(obj_id)
+            if obj is None:
+                obj = cls._materialize(obj_id)
+            if obj is not None:
+                result.append(obj)
+        return result
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        engine = cls._engine()
+        if engine is not None:
+            return engine.get(id)
+        cls._refresh()
+        obj = DATA[s_class].get(id)
+        if obj is None and id in LAZY.get(s_class, ()):
+            obj = cls._materialize(id)
+        return obj
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
-        """ Search all objects with matching attributes
+        """ Search all objects with matching attributes, starting from
+        the most selective secondary index when one applies
         """
         s_class = cls.__name__
+        engine = cls._engine()
+        if engine is not None:
+            return engine.search(attributes)
+        cls._refresh()
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -133,5 +773,170 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))      
+
+        best_ids = None
+        for k, v in attributes.items():
+            index = INDEXES[s_class].get(k)
+            if index is None:
+                continue
+            try:
+                ids = index[0].get(v, {})
+            except TypeError:
+                continue
+            if best_ids is None or len(ids) < len(best_ids):
+                best_ids = ids
+
+        if best_ids is None:
+            cls._materialize_all()
+            candidates = DATA[s_class].values()
+        else:
+            candidates = []
+            for obj_id in list(best_ids):
+                obj = DATA[s_class].get(obj_id)
+                if obj is None:
+                    obj = cls._materialize(obj_id)
+                if obj is not None:
+                    candidates.append(obj)
+        return list(filter(_search, candidates))
+
+
+def _format_entry(obj_id: str, obj_json: dict) -> bytes:
+    """ One `"id": {...}` line of a snapshot file
+    """
+    return "{}: {}".format(
+        json_codec.dumps(obj_id), json_codec.dumps(obj_json)).encode()
+
+
+def _parse_entry(line: bytes) -> Tuple[str, dict]:
+    """ Parse one `"id": {...},` line of a snapshot file
+    """
+    (obj_id, obj_json), = json_codec.loads(
+        b"{" + line.rstrip(b",\r\n") + b"}").items()
+    return obj_id, obj_json
+
+
+def _snapshot_entries(f) -> Iterator[Tuple[Optional[int], str, dict]]:
+    """ Stream (offset, id, JSON dict) per object of a snapshot file
+    opened in binary mode. Files written one object per line are read
+    line by line; others are parsed whole and yield no offset.
+    """
+    first = f.readline()
+    if first.rstrip() != b"{":
+        f.seek(0)
+        for obj_id, obj_json in json_codec.loads(f.read()).items():
+            yield None, obj_id, obj_json
+        return
+
+    offset = len(first)
+    for line in f:
+        if line.rstrip() != b"}":
+            obj_id, obj_json = _parse_entry(line)
+            yield offset, obj_id, obj_json
+        offset += len(line)
+
+
+def _unindex(ids_by_value: dict, value, obj_id: str):
+    """ Drop an object ID from the IDs indexed under a value
+    """
+    ids = ids_by_value[value]
+    del ids[obj_id]
+    if len(ids) == 0:
+        del ids_by_value[value]
+
+
+def _skip_covered(journal_path: str, state: dict) -> int:
+    """ Move a file state past the journal records its snapshot already
+    holds: those before the last `snapshot` record naming the version
+    loaded. Return the number of put/delete records skipped.
+    """
+    signature = list(state['snapshot'])
+    skipped = 0
+    try:
+        f = open(journal_path, 'rb')
+    except FileNotFoundError:
+        return 0
+    with f:
+        offset = 0
+        records = 0
+        token = None
+        for line in f:
+            try:
+                record = json_codec.loads(line)
+            except ValueError:
+                break
+            offset += len(line)
+            if record['op'] == 'start':
+                token = record['id']
+            elif record['op'] != 'snapshot':
+                records += 1
+            elif record['id'] == signature:
+                state['journal'] = offset
+                state['token'] = token
+                skipped = records
+    return skipped
+
+
+def _journal_token(journal_path: str) -> Optional[str]:
+    """ Token of the `start` record opening a journal, None if missing
+    """
+    try:
+        with open(journal_path, 'rb') as f:
+            record = json_codec.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    return record['id'] if record.get('op') == 'start' else None
+
+
+def _file_signature(st: os.stat_result) -> Tuple[int, int, int]:
+    """ Identity of a file version: inode, mtime and size
+    """
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _path_signature(file_path: str) -> Optional[Tuple[int, int, int]]:
+    """ Identity of the current version of a file, None if missing
+    """
+    try:
+        return _file_signature(os.stat(file_path))
+    except FileNotFoundError:
+        return None
+
+
+def _path_size(file_path: str) -> int:
+    """ Size of a file, 0 if missing
+    """
+    signature = _path_signature(file_path)
+    return signature[2] if signature is not None else 0
+
+
+def _install_flush_hooks():
+    """ Flush write-behind mutations at exit and on SIGTERM
+    """
+    global _flush_hooks_installed
+    if _flush_hooks_installed:
+        return
+    _flush_hooks_installed = True
+    atexit.register(Base.flush_all)
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is not signal.SIG_DFL:
+        return
+
+    def _on_sigterm(signum, frame):
+        # The handler may run in the middle of a locked write of the
+        # main thread, where flushing would reenter the lock and
+        # rewrite the same files: only flag the shutdown and let
+        # another thread flush once the lock is free
+        _terminating.set()
+        signal.signal(signum, signal.SIG_DFL)
+        threading.Thread(target=_terminate, args=(signum,),
+                         name='sigterm-flush').start()
+
+    signal.signal(signal.SIGTERM, _on_sigterm)
+
+
+def _terminate(signum: int):
+    """ Flush write-behind mutations, then die of the signal
+    """
+    Base.flush_all()
+    os.kill(os.getpid(), signum)
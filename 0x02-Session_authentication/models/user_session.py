@@ -7,6 +7,10 @@ from models.base import Base
 class UserSession(Base):
     """ UserSession model class """
 
+    __slots__ = ('user_id', 'session_id')
+    indexed_attributes = ('user_id', 'session_id')
+    storage = 'journal'
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a UserSession instance """
         super().__init__(*args, **kwargs)
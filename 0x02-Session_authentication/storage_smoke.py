@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Multi-process smoke test of the file storage
+
+Usage: ./storage_smoke.py [processes] [writes]
+
+Runs in a temporary directory: several processes write Users at once
+with every file backend (file, journal, lazy load, write-behind),
+then checks a fresh load sees every write, including the ones a
+crash left in the journal only.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from models import base
+from models.user import User
+
+
+def configure(storage: str, write_behind: float, lazy_load: bool) -> None:
+    """ Selects the backend of User in this process """
+    User.storage = storage
+    User.write_behind = write_behind
+    User.lazy_load = lazy_load
+    User.load_from_file()
+
+
+def write_users(name: str, writes: int, config: tuple) -> None:
+    """ Saves `writes` Users, renames the first one, removes the last """
+    configure(*config)
+    users = []
+    for i in range(writes):
+        user = User()
+        user.email = '{}-{}@x'.format(name, i)
+        user.save()
+        users.append(user)
+    users[0].first_name = 'renamed'
+    users[0].save()
+    users[-1].remove()
+    User.flush()
+
+
+def save_one(email: str, config: tuple) -> None:
+    """ Saves a single User """
+    configure(*config)
+    user = User()
+    user.email = email
+    user.save()
+
+
+def reload_emails(config: tuple) -> set:
+    """ Emails of the Users a fresh process loads """
+    configure(*config)
+    return {user.email for user in User.all()}
+
+
+def check(label: str, ok: bool) -> bool:
+    """ Prints one result line """
+    print('{:<50} {}'.format(label, 'OK' if ok else 'FAIL'))
+    return ok
+
+
+def run(context, target, *args):
+    """ Runs a function in a new process and returns its result """
+    with context.Pool(1) as pool:
+        return pool.apply(target, args)
+
+
+def concurrent_writers(context, config: tuple, processes: int,
+                       writes: int) -> bool:
+    """ Processes writing at once all see their writes persisted """
+    procs = [context.Process(target=write_users,
+                             args=('p{}'.format(i), writes, config))
+             for i in range(processes)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    expected = {'p{}-{}@x'.format(i, j)
+                for i in range(processes) for j in range(writes - 1)}
+    emails = run(context, reload_emails, config)
+    configure(*config)
+    renamed = User.search({'email': 'p0-0@x'})
+    return check('{} writers {}'.format(processes, config),
+                 emails == expected and len(renamed) == 1 and
+                 renamed[0].first_name == 'renamed')
+
+
+def pending_write_behind(context, config: tuple) -> bool:
+    """ A write-behind flush keeps what others wrote meanwhile """
+    configure(config[0], 60, config[2])
+    user = User()
+    user.email = 'A@x'
+    user.save()
+    run(context, save_one, 'B@x', config)
+    User.flush()
+    emails = run(context, reload_emails, config)
+    User.write_behind = 0
+    return check('write-behind flush {}'.format(config),
+                 {'A@x', 'B@x'} <= emails)
+
+
+def crash_after_append(context, config: tuple) -> bool:
+    """ A journaled write the snapshot never got is not lost, even
+    when both files share the same mtime
+    """
+    configure(*config)
+    user = User()
+    user.email = 'kept@x'
+    user.save()
+    user = User()
+    user.email = 'journal-only@x'
+    # crash between the journal append and the snapshot rewrite
+    User._append_journal(
+        [{'op': 'put', 'id': user.id, 'obj': user.to_json(True)}])
+    now = time.time()
+    for file_path in ('.db_User.json', '.db_User.journal'):
+        if os.path.exists(file_path):
+            os.utime(file_path, (now, now))
+    emails = run(context, reload_emails, config)
+    return check('crash after journal append {}'.format(config),
+                 {'kept@x', 'journal-only@x'} <= emails)
+
+
+def main(processes: int, writes: int) -> int:
+    """ Runs every scenario with every backend in a fresh directory """
+    context = multiprocessing.get_context('spawn')
+    configs = [('file', 0, False), ('journal', 0, False),
+               ('file', 0, True), ('file', 0.05, False)]
+    cwd = os.getcwd()
+    ok = True
+    for config in configs:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                ok &= concurrent_writers(context, config, processes, writes)
+                ok &= pending_write_behind(context, config)
+                ok &= crash_after_append(context, config)
+            finally:
+                os.chdir(cwd)
+                base.FILE_STATES.clear()
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    sys.exit(main(processes, writes))
@@ -6,7 +6,67 @@ import bcrypt
 from db import DB
 from user import User
 from sqlalchemy.orm.exc import NoResultFound, InvalidRequestError
+from os import getenv
+from typing import Optional
 from uuid import uuid4
+import time
+
+_DEFAULT_ROUNDS = 12
+# Cost factors accepted by bcrypt
+_MIN_ROUNDS = 4
+_MAX_ROUNDS = 31
+# Lowest cost factor calibration may pick, however small the budget
+_MIN_SAFE_ROUNDS = 10
+_rounds: Optional[int] = None
+
+
+def _calibrate_rounds(target_ms: float, probe_rounds: int = 8) -> int:
+    """
+    Picks the bcrypt cost factor hashing within a latency budget.
+
+    Args:
+        target_ms: Latency budget of one hash in milliseconds.
+        probe_rounds: Cost factor timed to extrapolate the others.
+
+    Returns:
+        The highest rounds value expected to hash within target_ms,
+        never less than _MIN_SAFE_ROUNDS.
+    """
+    salt = bcrypt.gensalt(rounds=probe_rounds, prefix=b"2b")
+    elapsed = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', salt)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    # Each extra round doubles the work.
+    rounds = probe_rounds
+    while rounds < _MAX_ROUNDS and \
+            elapsed * 2 ** (rounds + 1 - probe_rounds) * 1000 <= target_ms:
+        rounds += 1
+    while rounds > _MIN_ROUNDS and \
+            elapsed * 2 ** (rounds - probe_rounds) * 1000 > target_ms:
+        rounds -= 1
+    return max(rounds, _MIN_SAFE_ROUNDS)
+
+
+def _bcrypt_rounds() -> int:
+    """
+    Resolves once the cost factor of new hashes: BCRYPT_ROUNDS if set,
+    else calibrated against BCRYPT_TARGET_MS if set, else the default.
+
+    Returns:
+        The bcrypt rounds.
+    """
+    global _rounds
+    if _rounds is None:
+        if getenv('BCRYPT_ROUNDS'):
+            _rounds = int(getenv('BCRYPT_ROUNDS'))
+        elif getenv('BCRYPT_TARGET_MS'):
+            _rounds = _calibrate_rounds(float(getenv('BCRYPT_TARGET_MS')))
+        else:
+            _rounds = _DEFAULT_ROUNDS
+    return _rounds
 
 
 def _hash_password(password: str) -> str:
@@ -20,7 +80,8 @@ def _hash_password(password: str) -> str:
         Hashed password as a string.
     """
     hashed = bcrypt.hashpw(
-      password.encode('utf-8'), bcrypt.gensalt(prefix=b"2b"))
+      password.encode('utf-8'),
+      bcrypt.gensalt(rounds=_bcrypt_rounds(), prefix=b"2b"))
     return hashed.decode()
 
 
@@ -40,6 +101,8 @@ class Auth:
 
     def __init__(self):
         self._db = DB()
+        # Calibrated at startup rather than on the first request
+        _bcrypt_rounds()
 
     def register_user(self, email: str, password: str) -> User:
         """
@@ -65,7 +128,8 @@ class Auth:
 
     def valid_login(self, email: str, password: str) -> bool:
         """
-        Validates the login credentials.
+        Validates the login credentials, rehashing the stored password
+        when its cost factor differs from the current one.
 
         Args:
             email: Email of the user.
@@ -81,6 +145,10 @@ class Auth:
             user = self._db.find_user_by(email=email)
             hashed_password = str.encode(user.hashed_password)
             valid = bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+            rounds = int(user.hashed_password.split('$')[2])
+            if valid and rounds != _bcrypt_rounds():
+                self._db.update_user(
+                  user.id, hashed_password=_hash_password(password))
             return valid
         except NoResultFound:
             return False